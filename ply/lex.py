@@ -39,6 +39,12 @@ import types
 import copy
 import os
 import inspect
+import pickle
+import tempfile
+
+# Version of the table format written by Lexer.writetab().  Stored tables from a
+# different version are ignored and the lexer is rebuilt.
+__tabversion__ = '4.0'
 
 # This tuple contains acceptable string types
 StringTypes = (str, bytes)
@@ -53,8 +59,11 @@ class LexError(Exception):
         self.args = (message,)
         self.text = s
 
-# Token class.  This class is used to represent the tokens produced.
+# Token class.  This class is used to represent the tokens produced.  Tokens
+# are slotted, so token rules can only set the attributes listed here.
 class LexToken(object):
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
     def __repr__(self):
         return f'LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})'
 
@@ -77,6 +86,14 @@ class PlyLogger(object):
     info = critical
     debug = critical
 
+# Null logger is used when no output is generated. Does nothing.
+class NullLogger(object):
+    def __getattribute__(self, name):
+        return self
+
+    def __call__(self, *args, **kwargs):
+        return self
+
 # -----------------------------------------------------------------------------
 #                        === Lexing Engine ===
 #
@@ -117,6 +134,7 @@ class Lexer:
         self.lexignore = ''           # Ignored characters
         self.lexliterals = ''         # Literal characters that can be passed through
         self.lexmodule = None         # Module
+        self.lexsignature = None      # Signature of the rules the lexer was built from
         self.lineno = 1               # Current line number
 
     def clone(self, object=None):
@@ -146,6 +164,149 @@ class Lexer:
             c.lexmodule = object
         return c
 
+    # ------------------------------------------------------------
+    # snapshot() - Return the compiled lexer specification as a
+    # dictionary of plain literals that can be written to a table
+    # file or pickled and later handed to restore()
+    # ------------------------------------------------------------
+    def snapshot(self):
+        # Rewrite the lexstatere table, replacing function objects with function names
+        tabre = {}
+        for statename, lre in self.lexstatere.items():
+            titem = []
+            for (pat, func), retext, renames in zip(lre, self.lexstateretext[statename],
+                                                    self.lexstaterenames[statename]):
+                titem.append((retext, _funcs_to_names(func, renames), renames))
+            tabre[statename] = titem
+
+        taberr = {}
+        for statename, ef in self.lexstateerrorf.items():
+            taberr[statename] = ef.__name__ if ef else None
+
+        tabeof = {}
+        for statename, ef in self.lexstateeoff.items():
+            tabeof[statename] = ef.__name__ if ef else None
+
+        return {
+            'tabversion':  __tabversion__,
+            'signature':   self.lexsignature,
+            'tokens':      tuple(sorted(self.lextokens)),
+            'reflags':     int(self.lexreflags),
+            'literals':    self.lexliterals,
+            'stateinfo':   self.lexstateinfo,
+            'statere':     tabre,
+            'stateignore': self.lexstateignore,
+            'stateerrorf': taberr,
+            'stateeoff':   tabeof,
+        }
+
+    # ------------------------------------------------------------
+    # restore() - Restore the lexer from a snapshot().  Rule names
+    # are bound to the methods of object (or the functions of a
+    # module) by name, no reflection over the rules takes place
+    # ------------------------------------------------------------
+    def restore(self, snapshot, object):
+        if snapshot.get('tabversion', '0.0') != __tabversion__:
+            raise ImportError('Inconsistent PLY version')
+
+        def bind(name):
+            return getattr(object, name) if name else None
+
+        self.lexsignature   = snapshot['signature']
+        self.lextokens      = set(snapshot['tokens'])
+        self.lexreflags     = snapshot['reflags']
+        self.lexliterals    = snapshot['literals']
+        self.lextokens_all  = self.lextokens | set(self.lexliterals)
+        self.lexstateinfo   = snapshot['stateinfo']
+        self.lexstateignore = snapshot['stateignore']
+        self.lexstatere     = {}
+        self.lexstateretext = {}
+        self.lexstaterenames = {}
+        for statename, lre in snapshot['statere'].items():
+            titem = []
+            txtitem = []
+            nameitem = []
+            for pat, func_name, renames in lre:
+                titem.append((re.compile(pat, self.lexreflags), _names_to_funcs(func_name, bind)))
+                txtitem.append(pat)
+                nameitem.append(renames)
+
+            self.lexstatere[statename] = titem
+            self.lexstateretext[statename] = txtitem
+            self.lexstaterenames[statename] = nameitem
+
+        self.lexstateerrorf = {}
+        for statename, ef in snapshot['stateerrorf'].items():
+            self.lexstateerrorf[statename] = bind(ef)
+
+        self.lexstateeoff = {}
+        for statename, ef in snapshot['stateeoff'].items():
+            self.lexstateeoff[statename] = bind(ef)
+
+        self.lexmodule = object
+        self.begin('INITIAL')
+
+    # ------------------------------------------------------------
+    # writetab() - Write the lexer snapshot to the open file f as
+    # Python literals.  The result can be restored with readtab()
+    # ------------------------------------------------------------
+    def writetab(self, f):
+        snapshot = self.snapshot()
+        f.write('_lextabversion = %r\n' % snapshot['tabversion'])
+        f.write('_lexsignature = %r\n' % snapshot['signature'])
+        f.write('_lextokens = %r\n' % (snapshot['tokens'],))
+        f.write('_lexreflags = %r\n' % snapshot['reflags'])
+        f.write('_lexliterals = %r\n' % snapshot['literals'])
+        f.write('_lexstateinfo = %r\n' % snapshot['stateinfo'])
+        f.write('_lexstatere = %r\n' % snapshot['statere'])
+        f.write('_lexstateignore = %r\n' % snapshot['stateignore'])
+        f.write('_lexstateerrorf = %r\n' % snapshot['stateerrorf'])
+        f.write('_lexstateeoff = %r\n' % snapshot['stateeoff'])
+
+    # ------------------------------------------------------------
+    # readtab() - Restore the lexer from a module written by
+    # writetab(), binding rule names to the attributes of object
+    # ------------------------------------------------------------
+    def readtab(self, lextab, object):
+        self.restore({
+            'tabversion':  getattr(lextab, '_lextabversion', '0.0'),
+            'signature':   lextab._lexsignature,
+            'tokens':      lextab._lextokens,
+            'reflags':     lextab._lexreflags,
+            'literals':    lextab._lexliterals,
+            'stateinfo':   lextab._lexstateinfo,
+            'statere':     lextab._lexstatere,
+            'stateignore': lextab._lexstateignore,
+            'stateerrorf': lextab._lexstateerrorf,
+            'stateeoff':   lextab._lexstateeoff,
+        }, object)
+
+    # ------------------------------------------------------------
+    # write_pickle() - Pickle the lexer snapshot to filename.  The
+    # file is written to a temporary name first and then moved into
+    # place so that concurrent readers never see a partial file
+    # ------------------------------------------------------------
+    def write_pickle(self, filename):
+        fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(filename) or '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as outf:
+                pickle.dump(self.snapshot(), outf, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, filename)
+        except BaseException:
+            try:
+                os.remove(tmpname)
+            except OSError:
+                pass
+            raise
+
+    # ------------------------------------------------------------
+    # read_pickle() - Restore the lexer from a file written by
+    # write_pickle()
+    # ------------------------------------------------------------
+    def read_pickle(self, filename, object):
+        with open(filename, 'rb') as in_f:
+            self.restore(pickle.load(in_f), object)
+
     # ------------------------------------------------------------
     # input() - Push a new string into the lexer
     # ------------------------------------------------------------
@@ -340,6 +501,50 @@ def get_caller_module_dict(levels):
     f = sys._getframe(levels)
     return { **f.f_globals, **f.f_locals }
 
+# -----------------------------------------------------------------------------
+# get_module_dict()
+#
+# This function returns a dictionary containing all of the symbols defined in
+# module, which may be a module, a class or an instance.
+# -----------------------------------------------------------------------------
+def get_module_dict(module):
+    _items = [(k, getattr(module, k)) for k in dir(module)]
+    ldict = dict(_items)
+    # If no __file__ attribute is available, try to obtain it from the __module__ instead
+    if '__file__' not in ldict:
+        ldict['__file__'] = sys.modules[ldict['__module__']].__file__
+    return ldict
+
+# -----------------------------------------------------------------------------
+# _funcs_to_names()
+#
+# Given a list of regular expression functions, this converts it to a list
+# suitable for output to a table file
+# -----------------------------------------------------------------------------
+def _funcs_to_names(funclist, namelist):
+    result = []
+    for f, name in zip(funclist, namelist):
+        if f and f[0]:
+            result.append((name, f[1]))
+        else:
+            result.append(f)
+    return result
+
+# -----------------------------------------------------------------------------
+# _names_to_funcs()
+#
+# Given a list of regular expression function names, this converts it back to
+# functions using the lookup function bind.
+# -----------------------------------------------------------------------------
+def _names_to_funcs(namelist, bind):
+    result = []
+    for n in namelist:
+        if n and n[0]:
+            result.append((bind(n[0]), n[1]))
+        else:
+            result.append(n)
+    return result
+
 # -----------------------------------------------------------------------------
 # _form_master_re()
 #
@@ -434,6 +639,18 @@ class LexerReflect(object):
         self.validate_rules()
         return self.error
 
+    # Compute a signature over the lexer rules
+    def signature(self):
+        parts = [' '.join(self.tokens), ''.join(self.literals), str(self.reflags)]
+        for state, stype in self.stateinfo.items():
+            parts.append('%s:%s' % (state, stype))
+            for fname, f in self.funcsym.get(state, []):
+                parts.append('%s:%s' % (fname, _get_regex(f)))
+            for name, r in self.strsym.get(state, []):
+                parts.append('%s:%s' % (name, r))
+            parts.append('ignore:%s' % self.ignore.get(state, ''))
+        return '\n'.join(parts)
+
     # Get the tokens map
     def get_tokens(self):
         tokens = self.ldict.get('tokens', None)
@@ -714,8 +931,8 @@ class LexerReflect(object):
 #
 # Build all of the regular expression rules from definitions in the supplied module
 # -----------------------------------------------------------------------------
-def lex(*, module=None, object=None, debug=False, 
-        reflags=int(re.VERBOSE), debuglog=None, errorlog=None):
+def lex(*, module=None, object=None, debug=False, optimize=False,
+        reflags=int(re.VERBOSE), debuglog=None, errorlog=None, picklefile=None):
 
     global lexer
 
@@ -737,19 +954,32 @@ def lex(*, module=None, object=None, debug=False,
 
     # Get the module dictionary used for the parser
     if module:
-        _items = [(k, getattr(module, k)) for k in dir(module)]
-        ldict = dict(_items)
-        # If no __file__ attribute is available, try to obtain it from the __module__ instead
-        if '__file__' not in ldict:
-            ldict['__file__'] = sys.modules[ldict['__module__']].__file__
+        ldict = get_module_dict(module)
     else:
         ldict = get_caller_module_dict(2)
 
     # Collect parser information from the dictionary
     linfo = LexerReflect(ldict, log=errorlog, reflags=reflags)
     linfo.get_all()
-    if linfo.validate_all():
-        raise SyntaxError("Can't build lexer")
+
+    # Restore the lexer from the pickled snapshot if it was built from the same rules
+    if picklefile and module:
+        try:
+            lexobj.read_pickle(picklefile, module)
+            if lexobj.lexsignature == linfo.signature():
+                token = lexobj.token
+                input = lexobj.input
+                lexer = lexobj
+                return lexobj
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            errorlog.warning("Couldn't read %r. %s", picklefile, e)
+        lexobj = Lexer()
+
+    if not optimize:
+        if linfo.validate_all():
+            raise SyntaxError("Can't build lexer")
 
     # Dump some basic debugging information
     if debug:
@@ -814,6 +1044,7 @@ def lex(*, module=None, object=None, debug=False,
             lexobj.lexstaterenames[state].extend(lexobj.lexstaterenames['INITIAL'])
 
     lexobj.lexstateinfo = stateinfo
+    lexobj.lexsignature = linfo.signature()
     lexobj.lexre = lexobj.lexstatere['INITIAL']
     lexobj.lexretext = lexobj.lexstateretext['INITIAL']
     lexobj.lexreflags = reflags
@@ -845,6 +1076,13 @@ def lex(*, module=None, object=None, debug=False,
             if s not in linfo.ignore:
                 linfo.ignore[s] = linfo.ignore.get('INITIAL', '')
 
+    # Write the snapshot file if requested
+    if picklefile:
+        try:
+            lexobj.write_pickle(picklefile)
+        except IOError as e:
+            errorlog.warning("Couldn't create %r. %s", picklefile, e)
+
     # Create global versions of the token() and input() functions
     token = lexobj.token
     input = lexobj.input
@@ -852,6 +1090,17 @@ def lex(*, module=None, object=None, debug=False,
 
     return lexobj
 
+# -----------------------------------------------------------------------------
+# lexsignature(module)
+#
+# Compute the signature of the lexing rules in module without building the
+# lexer.  This is used to check whether stored lexer tables are still current.
+# -----------------------------------------------------------------------------
+def lexsignature(*, module, reflags=int(re.VERBOSE)):
+    linfo = LexerReflect(get_module_dict(module), log=NullLogger(), reflags=reflags)
+    linfo.get_all()
+    return linfo.signature()
+
 # -----------------------------------------------------------------------------
 # runmain()
 #
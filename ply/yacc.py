@@ -61,10 +61,14 @@
 # own risk!
 # ----------------------------------------------------------------------------
 
+import copy
 import re
 import types
 import sys
+import os
 import inspect
+import pickle
+import tempfile
 
 #-----------------------------------------------------------------------------
 #                     === User configurable parameters ===
@@ -79,6 +83,11 @@ debug_file  = 'parser.out'     # Default name of the debugging file
 error_count = 3                # Number of symbols that must be shifted to leave recovery mode
 resultlimit = 40               # Size limit of results when running in debug mode.
 
+pickle_protocol = pickle.HIGHEST_PROTOCOL  # Protocol used when caching tables with pickle
+
+__tabversion__ = '4.0'         # Version of the table format. Stored tables from
+                               # a different version are ignored and rebuilt
+
 MAXINT = sys.maxsize
 
 # This object is a stand-in for a logging object created by the
@@ -116,6 +125,10 @@ class NullLogger(object):
 class YaccError(Exception):
     pass
 
+# Exception raised when a stored table has the wrong format version
+class VersionError(YaccError):
+    pass
+
 # Format the result message that the parser produces when running in debug mode.
 def format_result(r):
     repr_str = repr(r)
@@ -152,8 +165,15 @@ def format_stack_entry(r):
 #        .endlineno  = Ending line number (optional, set automatically)
 #        .lexpos     = Starting lex position
 #        .endlexpos  = Ending lex position (optional, set automatically)
+#        .lexer      = Lexer (only set on a symbol passed to p_error())
+#
+# Symbols are slotted and LRParser.parse() reuses the nonterminal symbols of
+# a production once it has been reduced, so grammar rules must not keep
+# references to the objects in p.slice.
 
 class YaccSymbol:
+    __slots__ = ('type', 'value', 'lineno', 'endlineno', 'lexpos', 'endlexpos', 'lexer')
+
     def __str__(self):
         return self.type
 
@@ -170,6 +190,8 @@ class YaccSymbol:
 # representing the range of positional information for a symbol.
 
 class YaccProduction:
+    __slots__ = ('slice', 'stack', 'lexer', 'parser')
+
     def __init__(self, s, stack=None):
         self.slice = s
         self.stack = stack
@@ -218,6 +240,60 @@ class YaccProduction:
     def error(self):
         raise SyntaxError
 
+# -----------------------------------------------------------------------------
+# @value_rule
+#
+# This decorator marks a grammar rule function that takes the values of the
+# symbols on the right hand side as arguments and returns the value of the
+# left hand side, instead of taking a YaccProduction.  For example:
+#
+#     @value_rule
+#     def p_expr_plus(left, plus, right):
+#         'expr : expr PLUS term'
+#         return left + right
+#
+# Value rules have no access to symbol positions or to the parser.  When all
+# rules of a grammar are value rules, the parser reduces them without
+# allocating a production slice or a symbol per reduction.
+# -----------------------------------------------------------------------------
+
+def value_rule(f):
+    f.value_rule = True
+    return f
+
+# -----------------------------------------------------------------------------
+# @errok_rule
+#
+# This decorator marks a value rule that ends error recovery when it is
+# reduced, as a rule calling p.parser.errok() would, so that the next error
+# is reported even if it is within three tokens of the last one.  For example:
+#
+#     @errok_rule
+#     def p_stmt_error(error):
+#         'stmt : error'
+#         return None
+# -----------------------------------------------------------------------------
+
+def errok_rule(f):
+    f.value_rule = True
+    f.errok = True
+    return f
+
+# Return the callable taking a YaccProduction for the rule function func
+def rule_callable(func):
+    if not getattr(func, 'value_rule', False):
+        return func
+
+    if getattr(func, 'errok', False):
+        def call(p):
+            p.slice[0].value = func(*[s.value for s in p.slice[1:]])
+            p.parser.errok()
+        return call
+
+    def call(p):
+        p.slice[0].value = func(*[s.value for s in p.slice[1:]])
+    return call
+
 # -----------------------------------------------------------------------------
 #                               == LRParser ==
 #
@@ -230,12 +306,24 @@ class LRParser:
         self.action = lrtab.lr_action
         self.goto = lrtab.lr_goto
         self.errorfunc = errorf
+        self.signature = None
+        self.compile_tables()
         self.set_defaulted_states()
         self.errorok = True
 
     def errok(self):
         self.errorok = True
 
+    # Return a parser that shares the parsing tables with this one but none
+    # of the per-parse state (stacks, current state and token function, error
+    # status), so that the two can parse at the same time in different threads.
+    def clone(self):
+        c = copy.copy(self)
+        for name in ('token', 'statestack', 'symstack', 'state'):
+            c.__dict__.pop(name, None)
+        c.errorok = True
+        return c
+
     def restart(self):
         del self.statestack[:]
         del self.symstack[:]
@@ -258,9 +346,63 @@ class LRParser:
             rules = list(actions.values())
             if len(rules) == 1 and rules[0] < 0:
                 self.defaulted_states[state] = rules[0]
+        self.flat_defaulted = [self.defaulted_states.get(state) for state in range(self.nstates)]
 
     def disable_defaulted_states(self):
         self.defaulted_states = {}
+        self.flat_defaulted = [None] * self.nstates
+
+    # Compile the action and goto tables to flat lists indexed by integer ids
+    # for the fast parsing loop.  Terminals are numbered in term_ids and the
+    # action of terminal id t in state s is flat_action[s * nterms + t], or
+    # None for a syntax error.  Likewise the goto of the nonterminal id n is
+    # flat_goto[s * nnonterms + n].  flat_productions holds the
+    # (name, len, nonterminal id, callable, value callable) of every production.
+    # state_symbols holds the symbol shifted or reduced to enter each state.
+    def compile_tables(self):
+        self.term_ids = {}
+        nonterm_ids = {}
+        for actions in self.action.values():
+            for name in actions:
+                self.term_ids.setdefault(name, len(self.term_ids))
+        for gotos in self.goto.values():
+            for name in gotos:
+                nonterm_ids.setdefault(name, len(nonterm_ids))
+        self.nstates = max(self.action, default=-1) + 1
+        self.nterms = nterms = len(self.term_ids)
+        self.nnonterms = nnonterms = len(nonterm_ids)
+
+        self.flat_action = [None] * (self.nstates * nterms)
+        self.state_symbols = [None] * self.nstates
+        for state, actions in self.action.items():
+            for name, t in actions.items():
+                self.flat_action[state * nterms + self.term_ids[name]] = t
+                if t > 0:
+                    self.state_symbols[t] = name
+        self.flat_goto = [None] * (self.nstates * nnonterms)
+        for state, gotos in self.goto.items():
+            for name, t in gotos.items():
+                self.flat_goto[state * nnonterms + nonterm_ids[name]] = t
+                self.state_symbols[t] = name
+        self.flat_productions = [(p.name, p.len, nonterm_ids.get(p.name), p.callable,
+                                  p.value_callable) for p in self.productions]
+        self.value_rules = all(p[4] for p in self.flat_productions[1:])
+
+    # Write the parsing tables to the open file f as Python literals.  The
+    # result can be imported and restored with LRTableData.read_table().
+    def write_table(self, f):
+        f.write('_tabversion = %r\n' % __tabversion__)
+        f.write('_lr_signature = %r\n' % self.signature)
+        f.write('_lr_action = %r\n' % self.action)
+        f.write('_lr_goto = %r\n' % self.goto)
+        f.write('_lr_productions = [\n')
+        for p in self.productions:
+            if p.func:
+                f.write('  (%r, %r, %d, %r, %r, %d),\n' % (p.str, p.name, p.len,
+                                                         p.func, os.path.basename(p.file), p.line))
+            else:
+                f.write('  (%r, %r, %d, None, None, None),\n' % (str(p), p.name, p.len))
+        f.write(']\n')
 
     # parse().
     #
@@ -268,9 +410,16 @@ class LRParser:
     # Two options are provided.  The debug flag turns on debugging so that you can
     # see the various rule reductions and parsing steps.  tracking turns on position
     # tracking.  In this mode, symbols will record the starting/ending line number and
-    # character index.
+    # character index.  errorfunc replaces the p_error() function of the parser for
+    # this call only.
+    #
+    # Without debugging and tracking, parsing starts in a fast loop over the flat
+    # integer tables (see compile_tables()) that only shifts and reduces.  At the
+    # first syntax error it hands its state over to the general loop below, which
+    # does the error recovery.  If all rules are value rules (see value_rule()),
+    # the fast loop keeps a stack of values only and calls the rules with them.
 
-    def parse(self, input=None, lexer=None, debug=False, tracking=False):
+    def parse(self, input=None, lexer=None, debug=False, tracking=False, errorfunc=None):
         # If debugging has been specified as a flag, turn it into a logging object
         if isinstance(debug, int) and debug:
             debug = PlyLogger(sys.stderr)
@@ -282,7 +431,9 @@ class LRParser:
         prod    = self.productions               # Local reference to production list (to avoid lookup on self.)
         defaulted_states = self.defaulted_states # Local reference to defaulted states
         pslice  = YaccProduction(None)           # Production object passed to grammar rules
+        free    = []                             # Reduced nonterminal symbols available for reuse
         errorcount = 0                           # Used during error recovery
+        errorfunc = errorfunc or self.errorfunc  # Syntax error handler
 
         if debug:
             debug.info('PLY: PARSE DEBUG START')
@@ -308,6 +459,7 @@ class LRParser:
         symstack = self.symstack = []       # Stack of grammar symbols
         pslice.stack = symstack             # Put in the production
         errtoken   = None                   # Err token
+        recovered  = None                   # Token an error symbol was last made for
 
         # The start state is assumed to be (0,$end)
 
@@ -316,6 +468,163 @@ class LRParser:
         sym.type = '$end'
         symstack.append(sym)
         state = 0
+
+        if not debug and not tracking:
+            term_ids = self.term_ids
+            nterms = self.nterms
+            nnonterms = self.nnonterms
+            flat_action = self.flat_action
+            flat_goto = self.flat_goto
+            flat_defaulted = self.flat_defaulted
+            flat_productions = self.flat_productions
+            state_symbols = self.state_symbols
+            if self.value_rules:
+                # The values of the symbols on the stack, symstack is rebuilt
+                # from them and the states if the general loop takes over
+                values = []
+                reduce_error = False
+                while True:
+                    t = flat_defaulted[state]
+                    if t is None:
+                        if not lookahead:
+                            lookahead = get_token()
+                            if not lookahead:
+                                lookahead = YaccSymbol()
+                                lookahead.type = '$end'
+                        tid = term_ids.get(lookahead.type)
+                        if tid is None:
+                            break
+                        t = flat_action[state * nterms + tid]
+                        if t is None:
+                            break
+
+                    if t > 0:
+                        statestack.append(t)
+                        state = t
+                        values.append(lookahead.value)
+                        lookahead = None
+                        continue
+
+                    if t == 0:
+                        return values[-1]
+
+                    _, plen, pnum, _, pvalue = flat_productions[-t]
+                    try:
+                        if plen == 1:
+                            value = pvalue(values[-1])
+                        elif plen == 2:
+                            value = pvalue(values[-2], values[-1])
+                        elif plen == 3:
+                            value = pvalue(values[-3], values[-2], values[-1])
+                        elif plen:
+                            value = pvalue(*values[-plen:])
+                        else:
+                            value = pvalue()
+                    except SyntaxError:
+                        reduce_error = True
+                        break
+                    if plen:
+                        del values[-plen:]
+                        del statestack[-plen:]
+                    values.append(value)
+                    state = flat_goto[statestack[-1] * nnonterms + pnum]
+                    statestack.append(state)
+
+                for _s, _v in zip(statestack[1:], values):
+                    sym = YaccSymbol()
+                    sym.type = state_symbols[_s]
+                    sym.value = _v
+                    symstack.append(sym)
+                if reduce_error:
+                    # As in the general loop, the last symbol of the production
+                    # is dropped and the result becomes the error lookahead
+                    lookaheadstack.append(lookahead)
+                    if plen:
+                        symstack.pop()
+                    statestack.pop()
+                    state = statestack[-1]
+                    sym = YaccSymbol()
+                    sym.type = 'error'
+                    sym.value = 'error'
+                    lookahead = sym
+                    errorcount = error_count
+                    self.errorok = False
+
+            else:
+                while True:
+                    t = flat_defaulted[state]
+                    if t is None:
+                        if not lookahead:
+                            lookahead = get_token()
+                            if not lookahead:
+                                lookahead = YaccSymbol()
+                                lookahead.type = '$end'
+                        tid = term_ids.get(lookahead.type)
+                        if tid is None:
+                            break
+                        t = flat_action[state * nterms + tid]
+                        if t is None:
+                            break
+
+                    if t > 0:
+                        statestack.append(t)
+                        state = t
+                        symstack.append(lookahead)
+                        lookahead = None
+                        continue
+
+                    if t == 0:
+                        return symstack[-1].value
+
+                    pname, plen, pnum, pcallable, _ = flat_productions[-t]
+                    sym = free.pop() if free else YaccSymbol()
+                    sym.type = pname
+                    sym.value = None
+                    if plen:
+                        targ = symstack[-plen-1:]
+                        targ[0] = sym
+                        pslice.slice = targ
+                        try:
+                            del symstack[-plen:]
+                            self.state = state
+                            pcallable(pslice)
+                            del statestack[-plen:]
+                        except SyntaxError:
+                            lookaheadstack.append(lookahead)
+                            symstack.extend(targ[1:-1])
+                            statestack.pop()
+                            state = statestack[-1]
+                            sym.type = 'error'
+                            sym.value = 'error'
+                            lookahead = sym
+                            errorcount = error_count
+                            self.errorok = False
+                            break
+                        symstack.append(sym)
+                        state = flat_goto[statestack[-1] * nnonterms + pnum]
+                        statestack.append(state)
+                        for _v in targ:
+                            if _v.__class__ is YaccSymbol and _v is not sym:
+                                free.append(_v)
+                    else:
+                        pslice.slice = [sym]
+                        try:
+                            self.state = state
+                            pcallable(pslice)
+                        except SyntaxError:
+                            lookaheadstack.append(lookahead)
+                            statestack.pop()
+                            state = statestack[-1]
+                            sym.type = 'error'
+                            sym.value = 'error'
+                            lookahead = sym
+                            errorcount = error_count
+                            self.errorok = False
+                            break
+                        symstack.append(sym)
+                        state = flat_goto[statestack[-1] * nnonterms + pnum]
+                        statestack.append(state)
+
         while True:
             # Get the next symbol on the input.  If a lookahead symbol
             # is already set, we just use that. Otherwise, we'll pull
@@ -370,7 +679,7 @@ class LRParser:
                     plen  = p.len
 
                     # Get production function
-                    sym = YaccSymbol()
+                    sym = free.pop() if free else YaccSymbol()
                     sym.type = pname       # Production name
                     sym.value = None
 
@@ -413,6 +722,10 @@ class LRParser:
                             symstack.append(sym)
                             state = goto[statestack[-1]][pname]
                             statestack.append(state)
+                            # The symbols of the right hand side are off the stack now
+                            for _v in targ:
+                                if _v.__class__ is YaccSymbol and _v is not sym:
+                                    free.append(_v)
                         except SyntaxError:
                             # If an error was set. Enter error recovery state
                             lookaheadstack.append(lookahead)    # Save the current lookahead token
@@ -430,8 +743,8 @@ class LRParser:
                     else:
 
                         if tracking:
-                            sym.lineno = lexer.lineno
-                            sym.lexpos = lexer.lexpos
+                            sym.lineno = sym.endlineno = lexer.lineno
+                            sym.lexpos = sym.endlexpos = lexer.lexpos
 
                         targ = [sym]
 
@@ -490,17 +803,19 @@ class LRParser:
                 # the user defined p_error() function if this is the
                 # first syntax error.  This function is only called if
                 # errorcount == 0.
-                if errorcount == 0 or self.errorok:
+                # Not for the token an error symbol was made for, whose
+                # error was reported already
+                if (errorcount == 0 or self.errorok) and lookahead is not recovered:
                     errorcount = error_count
                     self.errorok = False
                     errtoken = lookahead
                     if errtoken.type == '$end':
                         errtoken = None               # End of file!
-                    if self.errorfunc:
+                    if errorfunc:
                         if errtoken and not hasattr(errtoken, 'lexer'):
                             errtoken.lexer = lexer
                         self.state = state
-                        tok = self.errorfunc(errtoken)
+                        tok = errorfunc(errtoken)
                         if self.errorok:
                             # User must have done some kind of panic
                             # mode recovery on their own.  The
@@ -527,9 +842,10 @@ class LRParser:
 
                 # case 1:  the statestack only has 1 entry on it.  If we're in this state, the
                 # entire parse has been rolled back and we're completely hosed.   The token is
-                # discarded and we just keep going.
+                # discarded and we just keep going.  Unless the start state takes an error
+                # symbol, then an error rule recovers from it as in any other state.
 
-                if len(statestack) <= 1 and lookahead.type != '$end':
+                if len(statestack) <= 1 and lookahead.type != '$end' and 'error' not in actions[0]:
                     lookahead = None
                     errtoken = None
                     state = 0
@@ -540,16 +856,19 @@ class LRParser:
                 # case 2: the statestack has a couple of entries on it, but we're
                 # at the end of the file. nuke the top entry and generate an error token
 
-                # Start nuking entries on the stack
-                if lookahead.type == '$end':
+                # Start nuking entries on the stack. An error rule may still
+                # take the end of the input, but only once
+                if lookahead.type == '$end' and getattr(recovered, 'type', None) == '$end':
                     # Whoa. We're really hosed here. Bail out
                     return
 
                 if lookahead.type != 'error':
                     sym = symstack[-1]
-                    if sym.type == 'error':
+                    if sym.type == 'error' or lookahead is recovered:
                         # Hmmm. Error is on top of stack, we'll just nuke input
-                        # symbol and continue
+                        # symbol and continue. So also if the error symbol made
+                        # for this token was reduced without getting past it,
+                        # as bison does, or the same error would repeat forever
                         if tracking:
                             sym.endlineno = getattr(lookahead, 'lineno', sym.lineno)
                             sym.endlexpos = getattr(lookahead, 'lexpos', sym.lexpos)
@@ -565,6 +884,7 @@ class LRParser:
                     if hasattr(lookahead, 'lexpos'):
                         t.lexpos = t.endlexpos = lookahead.lexpos
                     t.value = lookahead
+                    recovered = lookahead
                     lookaheadstack.append(lookahead)
                     lookahead = t
                 else:
@@ -612,6 +932,8 @@ _is_identifier = re.compile(r'^[a-zA-Z0-9_-]+$')
 #
 #       len       - Length of the production (number of symbols on right hand side)
 #       usyms     - Set of unique symbols found in the production
+#       callable  - Callable taking a YaccProduction, set by bind()
+#       value_callable - The production function if it is a value rule
 # -----------------------------------------------------------------------------
 
 class Production(object):
@@ -622,6 +944,7 @@ class Production(object):
         self.number   = number
         self.func     = func
         self.callable = None
+        self.value_callable = None
         self.file     = file
         self.line     = line
         self.prec     = precedence
@@ -680,7 +1003,41 @@ class Production(object):
     # Bind the production function name to a callable
     def bind(self, pdict):
         if self.func:
-            self.callable = pdict[self.func]
+            self.callable = rule_callable(pdict[self.func])
+            if getattr(pdict[self.func], 'value_rule', False):
+                self.value_callable = pdict[self.func]
+
+# -----------------------------------------------------------------------------
+# class MiniProduction
+#
+# This class is a stripped down version of Production that is used when the
+# parsing tables are restored from a stored table instead of being built from
+# the grammar.  It only holds the information needed by the LR parsing engine.
+# -----------------------------------------------------------------------------
+
+class MiniProduction(object):
+    def __init__(self, str, name, len, func, file, line):
+        self.name     = name
+        self.len      = len
+        self.func     = func
+        self.callable = None
+        self.value_callable = None
+        self.file     = file
+        self.line     = line
+        self.str      = str
+
+    def __str__(self):
+        return self.str
+
+    def __repr__(self):
+        return 'MiniProduction(%s)' % self.str
+
+    # Bind the production function name to a callable
+    def bind(self, pdict):
+        if self.func:
+            self.callable = rule_callable(pdict[self.func])
+            if getattr(pdict[self.func], 'value_rule', False):
+                self.value_callable = pdict[self.func]
 
 # -----------------------------------------------------------------------------
 # class LRItem
@@ -1258,23 +1615,26 @@ class Grammar(object):
 # This is used to compute the values of Read() sets as well as FOLLOW sets
 # in LALR(1) generation.
 #
-# Inputs:  X    - An input set
+# Inputs:  n    - Number of elements in the input set.  Elements are the
+#                 integers 0 .. n-1
 #          R    - A relation
-#          FP   - Set-valued function
+#          FP   - Set-valued function.  Sets are dicts used as ordered sets
+#                 (all values None) so that the result does not depend on
+#                 hashing order.
+#
+# Returns a list with the computed set of each element.
 # ------------------------------------------------------------------------------
 
-def digraph(X, R, FP):
-    N = {}
-    for x in X:
-        N[x] = 0
+def digraph(n, R, FP):
+    N = [0] * n
     stack = []
-    F = {}
-    for x in X:
+    F = [None] * n
+    for x in range(n):
         if N[x] == 0:
-            traverse(x, N, stack, F, X, R, FP)
+            traverse(x, N, stack, F, R, FP)
     return F
 
-def traverse(x, N, stack, F, X, R, FP):
+def traverse(x, N, stack, F, R, FP):
     stack.append(x)
     d = len(stack)
     N[x] = d
@@ -1283,11 +1643,9 @@ def traverse(x, N, stack, F, X, R, FP):
     rel = R(x)               # Get y's related to x
     for y in rel:
         if N[y] == 0:
-            traverse(y, N, stack, F, X, R, FP)
+            traverse(y, N, stack, F, R, FP)
         N[x] = min(N[x], N[y])
-        for a in F.get(y, []):
-            if a not in F[x]:
-                F[x].append(a)
+        F[x].update(F[y])
     if N[x] == d:
         N[stack[-1]] = MAXINT
         F[stack[-1]] = F[x]
@@ -1301,6 +1659,51 @@ class LALRError(YaccError):
     pass
 
 
+# -----------------------------------------------------------------------------
+#                             == LRTableData ==
+#
+# This class holds parsing tables that were previously built by LRTable and
+# stored on disk.  It provides the same lr_action, lr_goto and lr_productions
+# attributes as LRTable so it can be handed directly to LRParser.
+# -----------------------------------------------------------------------------
+
+class LRTableData:
+    def __init__(self):
+        self.lr_action      = None
+        self.lr_goto        = None
+        self.lr_productions = None
+
+    # Read tables from a module written by LRParser.write_table().  Returns the
+    # signature of the grammar the tables were built from.
+    def read_table(self, parsetab):
+        if getattr(parsetab, '_tabversion', '0.0') != __tabversion__:
+            raise VersionError('yacc table file version is out of date')
+
+        self.lr_action = parsetab._lr_action
+        self.lr_goto = parsetab._lr_goto
+        self.lr_productions = [MiniProduction(*p) for p in parsetab._lr_productions]
+        return parsetab._lr_signature
+
+    # Read tables written by LRTable.pickle_table().  Returns the signature of
+    # the grammar the tables were built from.
+    def read_pickle(self, filename):
+        with open(filename, 'rb') as in_f:
+            tabversion = pickle.load(in_f)
+            if tabversion != __tabversion__:
+                raise VersionError('yacc table file version is out of date')
+            signature      = pickle.load(in_f)
+            self.lr_action = pickle.load(in_f)
+            self.lr_goto   = pickle.load(in_f)
+            productions    = pickle.load(in_f)
+
+        self.lr_productions = [MiniProduction(*p) for p in productions]
+        return signature
+
+    # Bind all production function names to callable objects in pdict
+    def bind_callables(self, pdict):
+        for p in self.lr_productions:
+            p.bind(pdict)
+
 # -----------------------------------------------------------------------------
 #                             == LRTable ==
 #
@@ -1321,10 +1724,11 @@ class LRTable:
         self.lr_action     = {}        # Action table
         self.lr_goto       = {}        # Goto table
         self.lr_productions  = grammar.Productions    # Copy of grammar Production array
-        self.lr_goto_cache = {}        # Cache of computed gotos
-        self.lr0_cidhash   = {}        # Cache of closures
-
-        self._add_count    = 0         # Internal counter used to detect cycles
+        self.lr_items      = []        # LR(0) items, by item number
+        self.lr_item_sym   = []        # Symbol after the "." of each item
+        self.lr_item_next  = []        # Item after moving the "." of each item
+        self.lr_nt_items   = {}        # Initial items of each nonterminal
+        self.lr0_trans     = []        # LR(0) transitions of each state
 
         # Diagnostic information filled in by the table generator
         self.sr_conflict   = 0
@@ -1336,6 +1740,7 @@ class LRTable:
 
         # Build the tables
         self.grammar.build_lritems()
+        self.number_items()
         self.grammar.compute_first()
         self.grammar.compute_follow()
         self.lr_parse_table()
@@ -1345,75 +1750,97 @@ class LRTable:
         for p in self.lr_productions:
             p.bind(pdict)
 
-    # Compute the LR(0) closure operation on I, where I is a set of LR(0) items.
+    # Write the tables to filename so that they can be restored later with
+    # LRTableData.read_pickle().  The file is written to a temporary name first
+    # and then moved into place so that concurrent readers never see a
+    # partially written file.
+    def pickle_table(self, filename, signature=''):
+        dirname = os.path.dirname(filename) or '.'
+        fd, tmpname = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as outf:
+                pickle.dump(__tabversion__, outf, pickle_protocol)
+                pickle.dump(signature, outf, pickle_protocol)
+                pickle.dump(self.lr_action, outf, pickle_protocol)
+                pickle.dump(self.lr_goto, outf, pickle_protocol)
+
+                outp = []
+                for p in self.lr_productions:
+                    if p.func:
+                        outp.append((p.str, p.name, p.len, p.func, os.path.basename(p.file), p.line))
+                    else:
+                        outp.append((str(p), p.name, p.len, None, None, None))
+                pickle.dump(outp, outf, pickle_protocol)
+            os.replace(tmpname, filename)
+        except BaseException:
+            try:
+                os.remove(tmpname)
+            except OSError:
+                pass
+            raise
+
+    # -----------------------------------------------------------------------------
+    # number_items()
+    #
+    # Numbers all of the LR(0) items of the grammar.  Table construction works
+    # on these item numbers instead of on the LRItem objects:
+    #
+    #       lr_items[i]      - LRItem object of item i
+    #       lr_item_sym[i]   - Grammar symbol right after the "." (None at the end)
+    #       lr_item_next[i]  - Item with the "." moved over that symbol
+    #       lr_nt_items[N]   - Initial items ("N -> . ...") of the productions of N
+    # -----------------------------------------------------------------------------
 
-    def lr0_closure(self, I):
-        self._add_count += 1
+    def number_items(self):
+        items = self.lr_items
+        syms  = self.lr_item_sym
+        nexts = self.lr_item_next
+        for p in self.grammar.Productions:
+            p.lr_number = len(items)
+            for lri in p.lr_items:
+                n = len(items)
+                items.append(lri)
+                if lri.lr_index < lri.len - 1:
+                    syms.append(lri.prod[lri.lr_index+1])
+                    nexts.append(n + 1)
+                else:
+                    syms.append(None)
+                    nexts.append(None)
 
-        # Add everything in I to J
-        J = I[:]
-        didadd = True
-        while didadd:
-            didadd = False
-            for j in J:
-                for x in j.lr_after:
-                    if getattr(x, 'lr0_added', 0) == self._add_count:
-                        continue
-                    # Add B --> .G to J
-                    J.append(x.lr_next)
-                    x.lr0_added = self._add_count
-                    didadd = True
+        for name, prods in self.grammar.Prodnames.items():
+            self.lr_nt_items[name] = [p.lr_number for p in prods]
+
+    # Compute the LR(0) closure operation on I, where I is a list of LR(0) item
+    # numbers.  All initial items of a nonterminal are added the first time the
+    # nonterminal appears after a ".".
 
+    def lr0_closure(self, I):
+        syms = self.lr_item_sym
+        nt_items = self.lr_nt_items
+
+        # J grows while it is scanned, so items added later are closed over too
+        J = list(I)
+        added = set()
+        for i in J:
+            n = syms[i]
+            if n in nt_items and n not in added:
+                added.add(n)
+                J.extend(nt_items[n])
         return J
 
-    # Compute the LR(0) goto function goto(I,X) where I is a set
-    # of LR(0) items and X is a grammar symbol.   This function is written
-    # in a way that guarantees uniqueness of the generated goto sets
-    # (i.e. the same goto set will never be returned as two different Python
-    # objects).  With uniqueness, we can later do fast set comparisons using
-    # id(obj) instead of element-wise comparison.
-
-    def lr0_goto(self, I, x):
-        # First we look for a previously cached entry
-        g = self.lr_goto_cache.get((id(I), x))
-        if g:
-            return g
-
-        # Now we generate the goto set in a way that guarantees uniqueness
-        # of the result
-
-        s = self.lr_goto_cache.get(x)
-        if not s:
-            s = {}
-            self.lr_goto_cache[x] = s
-
-        gs = []
-        for p in I:
-            n = p.lr_next
-            if n and n.lr_before == x:
-                s1 = s.get(id(n))
-                if not s1:
-                    s1 = {}
-                    s[id(n)] = s1
-                gs.append(n)
-                s = s1
-        g = s.get('$end')
-        if not g:
-            if gs:
-                g = self.lr0_closure(gs)
-                s['$end'] = g
-            else:
-                s['$end'] = gs
-        self.lr_goto_cache[(id(I), x)] = g
-        return g
+    # Compute the LR(0) sets of items.  States are identified by their kernel
+    # (the tuple of item numbers reached from the predecessor state), which
+    # guarantees that the same item set is never added twice.  The transitions
+    # of every state are recorded in lr0_trans[state][symbol] = state.
 
-    # Compute the LR(0) sets of item function
     def lr0_items(self):
-        C = [self.lr0_closure([self.grammar.Productions[0].lr_next])]
-        i = 0
-        for I in C:
-            self.lr0_cidhash[id(I)] = i
-            i += 1
+        syms  = self.lr_item_sym
+        nexts = self.lr_item_next
+        items = self.lr_items
+        trans = self.lr0_trans
+
+        C = [self.lr0_closure([self.grammar.Productions[0].lr_number])]
+        kernels = {}
 
         # Loop over the items in C and each grammar symbols
         i = 0
@@ -1421,18 +1848,31 @@ class LRTable:
             I = C[i]
             i += 1
 
-            # Collect all of the symbols that could possibly be in the goto(I,X) sets
-            asyms = {}
-            for ii in I:
-                for s in ii.usyms:
-                    asyms[s] = None
+            # Group the items of I by the symbol right after the "."
+            gotos = {}
+            for p in I:
+                x = syms[p]
+                if x is not None:
+                    g = gotos.get(x)
+                    if g is None:
+                        gotos[x] = [nexts[p]]
+                    else:
+                        g.append(nexts[p])
 
-            for x in asyms:
-                g = self.lr0_goto(I, x)
-                if not g or id(g) in self.lr0_cidhash:
-                    continue
-                self.lr0_cidhash[id(g)] = len(C)
-                C.append(g)
+            # New states are numbered in the order in which the symbols are used
+            # by the productions of I
+            st_trans = {}
+            for p in I:
+                for x in items[p].usyms:
+                    if x in st_trans or x not in gotos:
+                        continue
+                    kernel = tuple(gotos[x])
+                    j = kernels.get(kernel)
+                    if j is None:
+                        j = kernels[kernel] = len(C)
+                        C.append(self.lr0_closure(kernel))
+                    st_trans[x] = j
+            trans.append(st_trans)
 
         return C
 
@@ -1488,20 +1928,23 @@ class LRTable:
     # Given a set of LR(0) items, this functions finds all of the non-terminal
     # transitions.    These are transitions in which a dot appears immediately before
     # a non-terminal.   Returns a list of tuples of the form (state,N) where state
-    # is the state number and N is the nonterminal symbol.
+    # is the state number and N is the nonterminal symbol.  The position of a
+    # transition in this list is used as its number by the functions below.
     #
     # The input C is the set of LR(0) items.
     # -----------------------------------------------------------------------------
 
     def find_nonterminal_transitions(self, C):
+        syms = self.lr_item_sym
+        Nonterminals = self.grammar.Nonterminals
         trans = []
+        seen = set()
         for stateno, state in enumerate(C):
             for p in state:
-                if p.lr_index < p.len - 1:
-                    t = (stateno, p.prod[p.lr_index+1])
-                    if t[1] in self.grammar.Nonterminals:
-                        if t not in trans:
-                            trans.append(t)
+                t = (stateno, syms[p])
+                if t[1] in Nonterminals and t not in seen:
+                    seen.add(t)
+                    trans.append(t)
         return trans
 
     # -----------------------------------------------------------------------------
@@ -1510,45 +1953,44 @@ class LRTable:
     # Computes the DR(p,A) relationships for non-terminal transitions.  The input
     # is a tuple (state,N) where state is a number and N is a nonterminal symbol.
     #
-    # Returns a list of terminals.
+    # Returns an ordered set (dict) of terminals.
     # -----------------------------------------------------------------------------
 
     def dr_relation(self, C, trans, nullable):
         state, N = trans
-        terms = []
+        syms = self.lr_item_sym
+        Terminals = self.grammar.Terminals
+        terms = {}
 
-        g = self.lr0_goto(C[state], N)
-        for p in g:
-            if p.lr_index < p.len - 1:
-                a = p.prod[p.lr_index+1]
-                if a in self.grammar.Terminals:
-                    if a not in terms:
-                        terms.append(a)
+        for p in C[self.lr0_trans[state][N]]:
+            a = syms[p]
+            if a in Terminals:
+                terms[a] = None
 
         # This extra bit is to handle the start state
         if state == 0 and N == self.grammar.Productions[0].prod[0]:
-            terms.append('$end')
+            terms['$end'] = None
 
         return terms
 
     # -----------------------------------------------------------------------------
     # reads_relation()
     #
-    # Computes the READS() relation (p,A) READS (t,C).
+    # Computes the READS() relation (p,A) READS (t,C).  Returns the numbers of
+    # the related transitions, tnum maps transitions to their numbers.
     # -----------------------------------------------------------------------------
 
-    def reads_relation(self, C, trans, empty):
+    def reads_relation(self, C, trans, empty, tnum):
         # Look for empty transitions
         rel = []
         state, N = trans
+        syms = self.lr_item_sym
 
-        g = self.lr0_goto(C[state], N)
-        j = self.lr0_cidhash.get(id(g), -1)
-        for p in g:
-            if p.lr_index < p.len - 1:
-                a = p.prod[p.lr_index + 1]
-                if a in empty:
-                    rel.append((j, a))
+        j = self.lr0_trans[state][N]
+        for p in C[j]:
+            a = syms[p]
+            if a in empty:
+                rel.append(tnum[(j, a)])
 
         return rel
 
@@ -1562,8 +2004,8 @@ class LRTable:
     # This relation is determined by running the LR(0) state machine forward.
     # For example, starting with a production "N : . A B C", we run it forward
     # to obtain "N : A B C ."   We then build a relationship between this final
-    # state and the starting state.   These relationships are stored in a dictionary
-    # lookdict.
+    # state and the starting state.   These relationships are stored in the list
+    # lookdict, indexed by transition number.
     #
     # INCLUDES:
     #
@@ -1580,54 +2022,50 @@ class LRTable:
     #
     # -----------------------------------------------------------------------------
 
-    def compute_lookback_includes(self, C, trans, nullable):
-        lookdict = {}          # Dictionary of lookback relations
-        includedict = {}       # Dictionary of include relations
+    def compute_lookback_includes(self, C, trans, nullable, tnum):
+        items = self.lr_items
+        syms  = self.lr_item_sym
+        nexts = self.lr_item_next
+        lr0_trans = self.lr0_trans
 
-        # Make a dictionary of non-terminal transitions
-        dtrans = {}
-        for t in trans:
-            dtrans[t] = 1
+        lookdict = []          # Lookback relations, by transition number
+        includedict = {}       # Include relations, by transition number
+
+        # For every item, whether everything after the "." derives empty
+        rest_empty = [False] * len(items)
+        for i in range(len(items) - 1, -1, -1):
+            a = syms[i]
+            rest_empty[i] = a is None or (a in nullable and rest_empty[nexts[i]])
 
         # Loop over all transitions and compute lookbacks and includes
-        for state, N in trans:
+        for k, (state, N) in enumerate(trans):
             lookb = []
             includes = []
-            for p in C[state]:
+            for i in C[state]:
+                p = items[i]
                 if p.name != N:
                     continue
 
                 # Okay, we have a name match.  We now follow the production all the way
                 # through the state machine until we get the . on the right hand side
 
-                lr_index = p.lr_index
                 j = state
-                while lr_index < p.len - 1:
-                    lr_index = lr_index + 1
-                    t = p.prod[lr_index]
-
+                t = syms[i]
+                while t is not None:
+                    i = nexts[i]
                     # Check to see if this symbol and state are a non-terminal transition
-                    if (j, t) in dtrans:
-                        # Yes.  Okay, there is some chance that this is an includes relation
-                        # the only way to know for certain is whether the rest of the
-                        # production derives empty
-
-                        li = lr_index + 1
-                        while li < p.len:
-                            if p.prod[li] in self.grammar.Terminals:
-                                break      # No forget it
-                            if p.prod[li] not in nullable:
-                                break
-                            li = li + 1
-                        else:
-                            # Appears to be a relation between (j,t) and (state,N)
-                            includes.append((j, t))
+                    # and the rest of the production derives empty
+                    jt = tnum.get((j, t))
+                    if jt is not None and rest_empty[i]:
+                        # Appears to be a relation between (j,t) and (state,N)
+                        includes.append(jt)
 
-                    g = self.lr0_goto(C[j], t)               # Go to next set
-                    j = self.lr0_cidhash.get(id(g), -1)      # Go to next state
+                    j = lr0_trans[j][t]                      # Go to next state
+                    t = syms[i]
 
                 # When we get here, j is the final state, now we have to locate the production
                 for r in C[j]:
+                    r = items[r]
                     if r.name != p.name:
                         continue
                     if r.len != p.len:
@@ -1643,8 +2081,8 @@ class LRTable:
             for i in includes:
                 if i not in includedict:
                     includedict[i] = []
-                includedict[i].append((state, N))
-            lookdict[(state, N)] = lookb
+                includedict[i].append(k)
+            lookdict.append(lookb)
 
         return lookdict, includedict
 
@@ -1656,14 +2094,15 @@ class LRTable:
     # Inputs:  C        =  Set of LR(0) items
     #          ntrans   = Set of nonterminal transitions
     #          nullable = Set of empty transitions
+    #          tnum     = Numbers of the nonterminal transitions
     #
-    # Returns a set containing the read sets
+    # Returns the read sets, by transition number
     # -----------------------------------------------------------------------------
 
-    def compute_read_sets(self, C, ntrans, nullable):
-        FP = lambda x: self.dr_relation(C, x, nullable)
-        R =  lambda x: self.reads_relation(C, x, nullable)
-        F = digraph(ntrans, R, FP)
+    def compute_read_sets(self, C, ntrans, nullable, tnum):
+        FP = lambda x: self.dr_relation(C, ntrans[x], nullable)
+        R =  lambda x: self.reads_relation(C, ntrans[x], nullable, tnum)
+        F = digraph(len(ntrans), R, FP)
         return F
 
     # -----------------------------------------------------------------------------
@@ -1679,13 +2118,13 @@ class LRTable:
     #            readsets   = Readset (previously computed)
     #            inclsets   = Include sets (previously computed)
     #
-    # Returns a set containing the follow sets
+    # Returns the follow sets, by transition number
     # -----------------------------------------------------------------------------
 
     def compute_follow_sets(self, ntrans, readsets, inclsets):
         FP = lambda x: readsets[x]
         R  = lambda x: inclsets.get(x, [])
-        F = digraph(ntrans, R, FP)
+        F = digraph(len(ntrans), R, FP)
         return F
 
     # -----------------------------------------------------------------------------
@@ -1701,15 +2140,15 @@ class LRTable:
     # -----------------------------------------------------------------------------
 
     def add_lookaheads(self, lookbacks, followset):
-        for trans, lb in lookbacks.items():
+        for trans, lb in enumerate(lookbacks):
             # Loop over productions in lookback
+            f = followset[trans]
             for state, p in lb:
-                if state not in p.lookaheads:
-                    p.lookaheads[state] = []
-                f = followset.get(trans, [])
-                for a in f:
-                    if a not in p.lookaheads[state]:
-                        p.lookaheads[state].append(a)
+                laheads = p.lookaheads.get(state)
+                if laheads is None:
+                    p.lookaheads[state] = dict(f)
+                else:
+                    laheads.update(f)
 
     # -----------------------------------------------------------------------------
     # add_lalr_lookaheads()
@@ -1722,14 +2161,15 @@ class LRTable:
         # Determine all of the nullable nonterminals
         nullable = self.compute_nullable_nonterminals()
 
-        # Find all non-terminal transitions
+        # Find all non-terminal transitions and number them
         trans = self.find_nonterminal_transitions(C)
+        tnum = {t: k for k, t in enumerate(trans)}
 
         # Compute read sets
-        readsets = self.compute_read_sets(C, trans, nullable)
+        readsets = self.compute_read_sets(C, trans, nullable, tnum)
 
         # Compute lookback/includes relations
-        lookd, included = self.compute_lookback_includes(C, trans, nullable)
+        lookd, included = self.compute_lookback_includes(C, trans, nullable, tnum)
 
         # Compute LALR FOLLOW sets
         followsets = self.compute_follow_sets(trans, readsets, included)
@@ -1760,6 +2200,8 @@ class LRTable:
         # Build the parser table, state by state
         st = 0
         for I in C:
+            I = [self.lr_items[i] for i in I]
+            st_trans = self.lr0_trans[st]
             # Loop over each production in I
             actlist = []              # List of actions
             st_action  = {}
@@ -1838,8 +2280,7 @@ class LRTable:
                         i = p.lr_index
                         a = p.prod[i+1]       # Get symbol right after the "."
                         if a in self.grammar.Terminals:
-                            g = self.lr0_goto(I, a)
-                            j = self.lr0_cidhash.get(id(g), -1)
+                            j = st_trans.get(a, -1)
                             if j >= 0:
                                 # We are in a shift state
                                 actlist.append((a, p, 'shift and go to state %d' % j))
@@ -1905,15 +2346,8 @@ class LRTable:
 
             # Construct the goto table for this state
 
-            nkeys = {}
-            for ii in I:
-                for s in ii.usyms:
-                    if s in self.grammar.Nonterminals:
-                        nkeys[s] = None
-            for n in nkeys:
-                g = self.lr0_goto(I, n)
-                j = self.lr0_cidhash.get(id(g), -1)
-                if j >= 0:
+            for n, j in st_trans.items():
+                if n in self.grammar.Nonterminals:
                     st_goto[n] = j
                     log.info('    %-30s shift and go to state %d', n, j)
 
@@ -1944,6 +2378,25 @@ def get_caller_module_dict(levels):
         ldict.update(f.f_locals)
     return ldict
 
+# -----------------------------------------------------------------------------
+# get_module_dict()
+#
+# This function returns a dictionary containing all of the symbols defined in
+# module, which may be a module, a class or an instance.
+# -----------------------------------------------------------------------------
+
+def get_module_dict(module):
+    _items = [(k, getattr(module, k)) for k in dir(module)]
+    pdict = dict(_items)
+    # If no __file__ or __package__ attributes are available, try to obtain them
+    # from the __module__ instead
+    if '__file__' not in pdict:
+        pdict['__file__'] = sys.modules[pdict['__module__']].__file__
+    if '__package__' not in pdict and '__module__' in pdict:
+        if hasattr(sys.modules[pdict['__module__']], '__package__'):
+            pdict['__package__'] = sys.modules[pdict['__module__']].__package__
+    return pdict
+
 # -----------------------------------------------------------------------------
 # parse_grammar()
 #
@@ -2023,6 +2476,19 @@ class ParserReflect(object):
         self.validate_modules()
         return self.error
 
+    # Collect the grammar rules of all p_functions without validating them.
+    # This is used in place of validate_all() in optimize mode.
+    def get_grammar(self):
+        self.validate_precedence()
+        grammar = []
+        for line, module, name, doc in self.pfuncs:
+            if not doc:
+                continue
+            file = self.pdict[name].__code__.co_filename
+            for g in parse_grammar(doc, file, line):
+                grammar.append((name, g))
+        self.grammar = grammar
+
     # Compute a signature over the grammar
     def signature(self):
         parts = []
@@ -2202,6 +2668,19 @@ class ParserReflect(object):
         self.pfuncs = p_functions
 
     # Validate all of the p_functions
+    # A value rule takes the value of every symbol on the right hand side of
+    # each of its productions (without a %prec modifier) as an argument
+    def validate_value_rule(self, func, production):
+        file, line, prodname, syms = production
+        if '%prec' in syms:
+            syms = syms[:syms.index('%prec')]
+        try:
+            inspect.signature(func).bind(*syms)
+        except TypeError:
+            self.log.error('%s:%d: Rule %r cannot take the %d values of production %s -> %s',
+                           file, line, func.__name__, len(syms), prodname, ' '.join(syms) or '<empty>')
+            self.error = True
+
     def validate_pfunctions(self):
         grammar = []
         # Check for non-empty symbols
@@ -2217,6 +2696,10 @@ class ParserReflect(object):
                 reqargs = 2
             else:
                 reqargs = 1
+            value_rule = getattr(func, 'value_rule', False)
+            if value_rule:
+                # Checked against the lengths of its productions below
+                reqargs = func.__code__.co_argcount
             if func.__code__.co_argcount > reqargs:
                 self.log.error('%s:%d: Rule %r has too many arguments', file, line, func.__name__)
                 self.error = True
@@ -2231,6 +2714,8 @@ class ParserReflect(object):
                     parsed_g = parse_grammar(doc, file, line)
                     for g in parsed_g:
                         grammar.append((name, g))
+                        if value_rule:
+                            self.validate_value_rule(func, g)
                 except SyntaxError as e:
                     self.log.error(str(e))
                     self.error = True
@@ -2270,7 +2755,7 @@ class ParserReflect(object):
 
 def yacc(*, debug=yaccdebug, module=None, start=None,
          check_recursion=True, optimize=False, debugfile=debug_file,
-         debuglog=None, errorlog=None):
+         debuglog=None, errorlog=None, picklefile=None):
 
     # Reference to the parsing method of the last built parser
     global parse
@@ -2280,15 +2765,7 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
 
     # Get the module dictionary used for the parser
     if module:
-        _items = [(k, getattr(module, k)) for k in dir(module)]
-        pdict = dict(_items)
-        # If no __file__ or __package__ attributes are available, try to obtain them
-        # from the __module__ instead
-        if '__file__' not in pdict:
-            pdict['__file__'] = sys.modules[pdict['__module__']].__file__
-        if '__package__' not in pdict and '__module__' in pdict:
-            if hasattr(sys.modules[pdict['__module__']], '__package__'):
-                pdict['__package__'] = sys.modules[pdict['__module__']].__package__
+        pdict = get_module_dict(module)
     else:
         pdict = get_caller_module_dict(2)
 
@@ -2303,6 +2780,25 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
     if pinfo.error:
         raise YaccError('Unable to build parser')
 
+    # Check signature against table files (if any)
+    signature = pinfo.signature()
+
+    # Read the tables
+    if picklefile:
+        try:
+            lr = LRTableData()
+            read_signature = lr.read_pickle(picklefile)
+            if read_signature == signature:
+                lr.bind_callables(pinfo.pdict)
+                parser = LRParser(lr, pinfo.error_func)
+                parser.signature = signature
+                parse = parser.parse
+                return parser
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            errorlog.warning("Couldn't read %r. %s", picklefile, e)
+
     if debuglog is None:
         if debug:
             try:
@@ -2317,8 +2813,11 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
 
     errors = False
 
-    # Validate the parser information
-    if pinfo.validate_all():
+    # Validate the parser information.  In optimize mode, validation and the
+    # inspection of source files is skipped and only the grammar is collected
+    if optimize:
+        pinfo.get_grammar()
+    elif pinfo.validate_all():
         raise YaccError('Unable to build parser')
 
     if not pinfo.error_func:
@@ -2474,9 +2973,32 @@ def yacc(*, debug=yaccdebug, module=None, start=None,
                 errorlog.warning('Rule (%s) is never reduced', rejected)
                 warned_never.append(rejected)
 
+    # Write the table file if requested
+    if picklefile:
+        try:
+            lr.pickle_table(picklefile, signature)
+        except IOError as e:
+            errorlog.warning("Couldn't create %r. %s", picklefile, e)
+
     # Build the parser
     lr.bind_callables(pinfo.pdict)
     parser = LRParser(lr, pinfo.error_func)
+    parser.signature = signature
 
     parse = parser.parse
     return parser
+
+# -----------------------------------------------------------------------------
+# yaccsignature(module)
+#
+# Compute the signature of the grammar in module without building the parser.
+# This is used to check whether stored parsing tables are still current.
+# -----------------------------------------------------------------------------
+
+def yaccsignature(*, module, start=None):
+    pdict = get_module_dict(module)
+    if start is not None:
+        pdict['start'] = start
+    pinfo = ParserReflect(pdict, log=NullLogger())
+    pinfo.get_all()
+    return pinfo.signature()
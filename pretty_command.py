@@ -5,7 +5,18 @@ import sys
 import subprocess
 import sublime
 import sublime_plugin
-from .proto_formatter import ProtoSettings, ProtoFormatter
+from .proto_formatter import IncrementalFormatter, warm_up
+from .proto_settings import ProtoSettings
+
+# IncrementalFormatter of every view by view id, formatting a view again
+# after an edit resumes from its checkpoints
+_formatters = {}
+
+def plugin_loaded():
+    # Build the parser off the plugin host's loading path, the fast engine
+    # needs none
+    if ProtoSettings().engine == 'ply':
+        warm_up()
 
 class PrettyProtobufCommand(sublime_plugin.TextCommand):
     def run(self, edit):
@@ -35,6 +46,24 @@ class PrettyProtobufCommand(sublime_plugin.TextCommand):
         # Replace with formatted content
         self.view.replace(edit, region, stdout.decode())
 
+def show_diagnostics(view, begin, diagnostics):
+    """
+    List the errors of the text at begin in view in an output panel
+    """
+    name = view.file_name() or view.name() or 'untitled'
+    row, col = view.rowcol(begin)
+    lines = []
+    for d in diagnostics:
+        column = d.column + col if d.line == 1 else d.column
+        line = f'{name}:{row + d.line}:{column}: {d.message}'
+        if d.expected:
+            line += f', expected {" ".join(d.expected)}'
+        lines.append(line + '\n')
+    panel = view.window().create_output_panel('pretty_protobuf')
+    panel.run_command('append', {'characters': ''.join(lines)})
+    view.window().run_command('show_panel', {'panel': 'output.pretty_protobuf'})
+    sublime.status_message(f'Pretty Protobuf: {len(diagnostics)} errors, nothing formatted')
+
 class PrettyDebugStringCommand(sublime_plugin.TextCommand):
     def run(self, edit):
         if len(self.view.sel()) < 1:
@@ -45,6 +74,24 @@ class PrettyDebugStringCommand(sublime_plugin.TextCommand):
         lines = self.view.substr(first_reg)
         if not lines:
             return
-        lines = ProtoFormatter(lines).format()
-        if lines:
-            self.view.replace(edit, first_reg, lines)
+        options = ProtoSettings().format_options()
+        formatter = _formatters.get(self.view.id())
+        if formatter is None or formatter.options != options:
+            formatter = _formatters[self.view.id()] = IncrementalFormatter(options)
+        result = formatter.format(lines)
+        if formatter.diagnostics:
+            # Leave the text as it is, formatting it would drop what could
+            # not be parsed
+            show_diagnostics(self.view, first_reg.begin(), formatter.diagnostics)
+            return
+        self.view.window().destroy_output_panel('pretty_protobuf')
+        if result:
+            # Replace only the part that changed
+            start, end, lines = result
+            if start != end or lines:
+                begin = first_reg.begin()
+                self.view.replace(edit, sublime.Region(begin + start, begin + end), lines)
+
+class PrettyDebugStringListener(sublime_plugin.EventListener):
+    def on_close(self, view):
+        _formatters.pop(view.id(), None)
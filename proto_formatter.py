@@ -1,11 +1,148 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import base64
+import bisect
+import copy
 import os
 import re
+import threading
+from array import array
+from itertools import accumulate
 from .ply import lex, yacc
-from collections import OrderedDict
-import sublime
+from collections import OrderedDict, namedtuple
+
+try:
+    from . import proto_tables
+except ImportError:
+    proto_tables = None
+
+def default_cachedir():
+    """
+    Directory used to cache the built parser tables between processes
+    """
+    base = (os.environ.get('XDG_CACHE_HOME') or os.environ.get('LOCALAPPDATA') or
+            os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'pretty-protobuf')
+
+# A backslash escape of a string literal, groups: octal digits, hex digits,
+# escaped character
+_escape = re.compile(r'\\(?:([0-7]{1,3})|[xX]([\da-fA-F]{1,2})|(.))', re.S)
+_char_escapes = {'a': b'\a', 'b': b'\b', 'f': b'\f', 'n': b'\n', 'r': b'\r', 't': b'\t', 'v': b'\v'}
+
+# An escaped backslash, or a run of octal '\nnn' or hex '\xnn' byte escapes
+_byte_escapes = re.compile(r'\\\\|((?:\\[0-7]{3}|\\[xX][\da-fA-F]{2})+)')
+
+def string_bytes(s):
+    """
+    Bytes of the string literal s (with quotes), all escapes decoded
+    """
+    content = s[1:-1]
+    if '\\' not in content:
+        return content.encode()
+    b = bytearray()
+    pos = 0
+    for m in _escape.finditer(content):
+        b += content[pos:m.start()].encode()
+        octal, hexa, char = m.groups()
+        if octal:
+            b.append(int(octal, 8) & 0xff)
+        elif hexa:
+            b.append(int(hexa, 16))
+        else:
+            b += _char_escapes.get(char) or char.encode()
+        pos = m.end()
+    b += content[pos:].encode()
+    return bytes(b)
+
+def _decode_run(m):
+    if not m.group(1):
+        return m.group(0)
+    return bytes(int(e[1:], 16) if e[0] in 'xX' else int(e, 8) & 0xff
+                 for e in m.group(1).split('\\')[1:]).decode()
+
+def decode_escapes(s):
+    """
+    Transform octal '\\nnn' or hex '\\xnn' byte sequences in the string
+    literal s to string object. Returns s unchanged if its bytes are not
+    UTF-8 text
+    """
+    if '\\' not in s or not _is_text(string_bytes(s)):
+        return s
+    return _byte_escapes.sub(_decode_run, s)
+
+class ProtoString(str):
+    """
+    String literal of a debug string. The str value is the source text with
+    the quotes and escapes, the other representations are built on demand
+    """
+    __slots__ = ()
+
+    def bytes(self):
+        return string_bytes(self)
+
+    def decode(self):
+        return decode_escapes(self)
+
+    def is_binary(self):
+        """
+        Whether the bytes of the string are not UTF-8 text
+        """
+        return '\\' in self and not _is_text(self.bytes())
+
+    def hex(self, data=None):
+        """
+        The bytes of the string in hex, data are its bytes if already known
+        """
+        return f'"{(self.bytes() if data is None else data).hex()}"'
+
+    def base64(self, data=None):
+        """
+        The bytes of the string in base64, data are its bytes if already known
+        """
+        data = self.bytes() if data is None else data
+        return '"%s"' % base64.b64encode(data).decode('ascii')
+
+    def display(self, options):
+        """
+        The string as shown with the FormatOptions options: verbatim, or
+        with the byte escapes decoded if options.decode_strings is set.
+        Strings that are not UTF-8 text are shown in options.bytes_format.
+        The escapes are decoded to bytes once for all of it
+        """
+        if '\\' not in self or not options.decode_strings and options.bytes_format == 'escape':
+            return self
+        data = self.bytes()
+        if _is_text(data):
+            # The bytes are UTF-8 text, so are the runs of byte escapes
+            return _byte_escapes.sub(_decode_run, self) if options.decode_strings else self
+        if options.bytes_format == 'hex':
+            return self.hex(data)
+        if options.bytes_format == 'base64':
+            return self.base64(data)
+        return self
+
+def _is_text(data):
+    try:
+        data.decode()
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def master_regex(rules, ignore='', reflags=0):
+    """
+    Join (kind, regex) rules to one regular expression that skips the
+    characters in ignore and then tries the rules in order, returns it with a
+    list mapping match.lastindex to the rule kind
+    """
+    kinds = [None]
+    for kind, r in rules:
+        kinds.append(kind)
+        kinds.extend([None] * re.compile(r, reflags).groups)
+    alternatives = '|'.join(f'({r})' for _, r in rules)
+    if ignore:
+        alternatives = f'[{re.escape(ignore)}]*(?:{alternatives})'
+    return re.compile(alternatives, reflags), kinds
 
 class Parser:
     """
@@ -13,9 +150,16 @@ class Parser:
     """
     tokens = ()
     precedence = ()
+    tables = None
 
     def __init__(self, **kw):
         self.debug = kw.get('debug', 0)
+        # Rule validation and source inspection are development checks,
+        # tools/gen_tables.py runs them whenever the grammar changes
+        self.optimize = kw.get('optimize', not self.debug)
+        self.errorlog = kw.get('errorlog')
+        self.cachedir = kw.get('cachedir', default_cachedir())
+        self.tables = kw.get('tables', self.tables)
         self.names = {}
         try:
             modname = os.path.split(os.path.splitext(__file__)[0])[
@@ -25,16 +169,77 @@ class Parser:
         self.debugfile = modname + ".dbg"
         # print self.debugfile
 
-        # Build the lexer and parser
-        lex.lex(module=self, debug=self.debug)
-        yacc.yacc(module=self,
-                  debug=self.debug,
-                  debugfile=self.debugfile)
+        # Restore the parser from the generated tables if they are still
+        # current, otherwise build the lexer and parser. Built tables are
+        # cached keyed by the grammar signature, a debug build always runs
+        # the full table construction to write the debug file. The PLY lexer
+        # is only built with the tables, to validate the rules and write
+        # them: parsers tokenize with ProtoScanner
+        self.lexer = None
+        self.lexfile = None
+        self.picklefile = None
+        if self.debug or not self.tables or not self.load_tables(self.tables):
+            if self.cachedir and not self.debug:
+                try:
+                    os.makedirs(self.cachedir, exist_ok=True)
+                    self.lexfile = os.path.join(self.cachedir, modname + ".lextab")
+                    self.picklefile = os.path.join(self.cachedir, modname + ".lrtab")
+                except OSError:
+                    pass
+            self.lexer = lex.lex(module=self,
+                                 debug=self.debug,
+                                 optimize=self.optimize,
+                                 errorlog=self.errorlog,
+                                 picklefile=self.lexfile)
+            self.parser = yacc.yacc(module=self,
+                                    debug=self.debug,
+                                    optimize=self.optimize,
+                                    debugfile=self.debugfile,
+                                    errorlog=self.errorlog,
+                                    picklefile=self.picklefile)
+
+    def load_tables(self, tables):
+        """
+        Restore the parser from a module written by write_tables(), returns
+        False if the module does not match the current grammar. The lexer
+        tables are only checked against the rules
+        """
+        if (getattr(tables, '_lexsignature', None) != lex.lexsignature(module=self) or
+                getattr(tables, '_lr_signature', None) != yacc.yaccsignature(module=self)):
+            return False
+        try:
+            lr = yacc.LRTableData()
+            signature = lr.read_table(tables)
+            lr.bind_callables(yacc.get_module_dict(self))
+        except (ImportError, AttributeError, yacc.YaccError, KeyError):
+            return False
+        self.parser = yacc.LRParser(lr, getattr(self, 'p_error', None))
+        self.parser.signature = signature
+        return True
+
+    def write_tables(self, f):
+        """
+        Write the lexer and parser tables to the open file f as a Python
+        module that can be restored with load_tables(), from a parser built
+        from the rules
+        """
+        f.write('# This file is generated by tools/gen_tables.py. Do not edit!\n')
+        self.lexer.writetab(f)
+        self.parser.write_table(f)
 
-    def parse(self, s):
-        return yacc.parse(s)
+    def clone(self):
+        """
+        Return a copy of the parser with its own LR parser, which shares the
+        tables with this one. A parser must not be used by several threads
+        at once, each thread can parse with its own clone
+        """
+        c = copy.copy(self)
+        c.parser = self.parser.clone()
+        return c
 
 class ProtoParser(Parser):
+    tables = proto_tables
+
     tokens = (
         'BOOL', 'NAME', 'FLOAT', 'INTEGER', 'STRING'
     )
@@ -50,164 +255,1399 @@ class ProtoParser(Parser):
 
     def t_STRING(self, t):
         r'\"([^\\\n]|(\\(.|\n)))*?\"'
-        def xint(s):
-            is_hex = False
-            if s[0] in ('x', 'X'):
-                s = s[1:]
-                is_hex = True
-            return int(s, 16 if is_hex else 8)
-        def byterepl(m):
-            s = m.group(0).split('\\')[1:]
-            b = bytearray()
-            b.extend(map(xint, s))
-            try:
-                return b.decode()
-            except UnicodeError as err:
-                print(f'{m.group(0) = }\n{err = }')
-                return m.group(0)
-        # Transform octal '\nnn' or hex '\xnn' byte sequences to string object
-        t.value = re.sub(r'((\\[0-7]{3})|(\\x[\da-fA-F]{2}))+', byterepl, t.value)
+        t.value = ProtoString(t.value)
         return t
 
-    t_ignore = " \t"
-
-    def t_newline(self, t):
-        r'\n+'
-        t.lexer.lineno += t.value.count("\n")
+    # Line numbers are looked up from token positions, see LineIndex
+    t_ignore = " \t\n"
 
     def t_error(self, t):
-        print("Illegal character '%s'" % t.value[0])
+        # As the ProtoScanner of a strict parse, the PLY lexer reports nothing
+        raise lex.LexError(f"Scanning error. Illegal character {t.value[0]!r}", t.value)
 
     # Parsing rules
 
-    def p_statement_expr(self, p):
+    @yacc.value_rule
+    def p_statement_expr(self, statement):
         """statement : pair_list
                      | object"""
-        p[0] = p[1]
+        return statement
 
-    def p_expression_key(self, p):
+    @yacc.value_rule
+    def p_expression_key(self, key):
         """key : NAME
                | INTEGER"""
-        p[0] = p[1]
+        return key
 
-    def p_expression_literal(self, p):
+    @yacc.value_rule
+    def p_expression_literal(self, literal):
         """literal : NAME
                    | BOOL
                    | FLOAT
                    | INTEGER
                    | STRING"""
         # NAME support enum
-        p[0] = p[1]
+        return literal
 
-    def p_expression_pair(self, p):
+    @yacc.value_rule
+    def p_expression_pair(self, key, *value):
         """pair : key ':' literal
                 | key object"""
-        if p[2] == ':':
-            p[0] = OrderedDict({p[1]: p[3]})
-        else:
-            p[0] = OrderedDict({p[1]: p[2]})
+        # The pair is (key, value), it is added to the object by pair_list
+        return key, value[-1]
+
+    @yacc.errok_rule
+    def p_expression_pair_error(self, error):
+        """pair : error"""
+        # The tokens skipped after an error, up to the next key or '}'. The
+        # next error is reported, however close
+        return None
 
-    def p_expression_pair_list(self, p):
+    @yacc.value_rule
+    def p_expression_pair_list(self, pairs, pair=None):
         """pair_list : pair
                      | pair_list pair"""
-        p[0] = p[1]
-        if len(p) <= 2:
-            return
-        for k, v in p[2].items():
-            if k not in p[0]:
-                p[0][k] = v
-            elif isinstance(p[0][k], list):
-                p[0][k].append(v)
-            else:
-                p[0][k] = [p[0][k], v]
+        if not isinstance(pairs, Message):
+            pairs, pair = Message(), pairs
+        if pair is not None:
+            pairs.append(*pair)
+        return pairs
 
-    def p_expression_object(self, p):
+    @yacc.value_rule
+    def p_expression_object(self, lbrace, pairs, rbrace=None):
         """object : '{' '}'
                   | '{' pair_list '}'"""
-        if p[2] == '}':
-            p[0] = OrderedDict()
-        else:
-            p[0] = p[2]
+        return Message() if rbrace is None else pairs
 
     def p_error(self, p):
+        # The error function of parses without one of their own, which fail
+        # as strict parses do
+        _strict_error(p)
+
+    def parse(self, s, start=0, end=None, strict=False, diagnostics=None):
+        """
+        Parse s, or the part of it from start to end. A strict parse reports
+        nothing and raises LexError or ParseError on the first error.
+
+        Otherwise the parse recovers from the errors: an illegal character
+        (the rest of the line at an unterminated string) is skipped, and the
+        field it is in is dropped as after a syntax error, where the tokens
+        up to the next key or '}' are skipped. A Diagnostic of every error
+        is appended to the list diagnostics. Returns the fields parsed, or
+        None if the input ends inside a message. Without the list, raises
+        ParseError if there are errors
+        """
+        if strict:
+            lexer = ProtoScanner()
+            lexer.input(s, start, end)
+            return self.parser.parse(lexer=lexer, errorfunc=_strict_error)
+        found = [] if diagnostics is None else diagnostics
+        end = len(s) if end is None else end
+        lexer = ProtoScanner(lambda t: self.__lex_error(t, found))
+        lexer.input(s, start, end)
+        result = self.parser.parse(lexer=lexer,
+                                   errorfunc=lambda p: self.__syntax_error(p, lexer, end, found))
+        if diagnostics is None and found:
+            raise ParseError(found[0].message, found[0].pos, found)
+        return result
+
+    def __lex_error(self, t, found):
+        lexer = t.lexer
+        pos = t.lexpos
+        if t.value[0] == '"':
+            message = 'Unterminated string'
+            skip = lexer.line_end(pos) - pos
+        else:
+            message = "Illegal character '%s'" % t.value[0]
+            # A whole UTF-8 character of bytes, escapes of undecodable bytes
+            # start with a backslash
+            skip = 1 if isinstance(lexer.lexdata, str) else len(t.value[0].encode())
+        found.append(Diagnostic('lexical', message, pos, lexer.lines.lineno(pos),
+                                lexer.lines.column(pos), ()))
+        lexer.skip(skip)
+        # The parser recovers from the error token as from a syntax error
+        return t
+
+    def __syntax_error(self, p, lexer, end, found):
+        if p and p.type == 'error':
+            # An illegal character, reported by __lex_error
+            return
+        # The parser state is the one the token was not expected in
+        expected = tuple(sorted(t for t in self.parser.action[self.parser.state] if t != 'error'))
         if p:
-            print("Syntax error at '%s'" % p.value)
+            message, pos = f"Syntax error at '{p.value}'", p.lexpos
         else:
-            print("Syntax error at EOF")
+            message, pos = "Syntax error at EOF", end
+        found.append(Diagnostic('syntax', message, pos, lexer.lines.lineno(pos),
+                                lexer.lines.column(pos), expected))
+
+def add_pair(obj, key, value):
+    """
+    Add the pair key: value to obj, the values of a repeated key are
+    collected in a list
+    """
+    if key not in obj:
+        obj[key] = value
+    elif isinstance(obj[key], list):
+        obj[key].append(value)
+    else:
+        obj[key] = [obj[key], value]
+
+class Message:
+    """
+    Message of a debug string: the names and the values of its fields in
+    input order, with an entry per value of a repeated field. A value is a
+    literal (str or ProtoString) or a Message. Iterating it generates the
+    (name, value) pairs
+    """
+    __slots__ = ('names', 'values')
 
-class ProtoSettings:
-    __instance = None
+    def __init__(self, names=None, values=None):
+        self.names = [] if names is None else names
+        self.values = [] if values is None else values
 
-    def __new__(cls, *args, **kwargs):
-        if cls.__instance is None:
-            cls.__instance = super().__new__(cls)
-        return cls.__instance
+    def append(self, name, value):
+        self.names.append(name)
+        self.values.append(value)
 
-    def __init__(self):
-        self.__settings = sublime.load_settings('Pretty Protobuf.sublime-settings')
-        self.__spaces = self.__settings.get('indent', 4)
-        self.__sort_keys = self.__settings.get('sort_keys', False)
-        self.__use_entire_file = self.__settings.get('use_entire_file_if_no_selection', True)
-        self.__clang_format_path = self.__settings.get('clang_format_path', '')
+    def __len__(self):
+        return len(self.names)
 
-    @property
-    def spaces(self):
-        return self.__spaces
+    def __iter__(self):
+        return zip(self.names, self.values)
 
-    @property
-    def sort_keys(self):
-        return self.__sort_keys
+    def __eq__(self, other):
+        if not isinstance(other, Message):
+            return NotImplemented
+        return self.names == other.names and self.values == other.values
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'Message({list(self)!r})'
+
+    def fields(self):
+        """
+        The fields as an OrderedDict in order of first appearance, the values
+        of a repeated field are collected in a list
+        """
+        obj = OrderedDict()
+        for name, value in self:
+            add_pair(obj, name, value)
+        return obj
+
+    def to_dict(self):
+        """
+        The fields as by fields(), with the nested messages as OrderedDicts too
+        """
+        obj = OrderedDict()
+        for name, value in self:
+            add_pair(obj, name, value.to_dict() if isinstance(value, Message) else value)
+        return obj
+
+class ParseError(Exception):
+    """
+    Syntax error of a strict parse, pos is the position of the unexpected
+    token or None at the end of the input. A parse that recovered from its
+    errors raises the first one, with the Diagnostic of every error in
+    diagnostics
+    """
+    def __init__(self, message, pos=None, diagnostics=()):
+        super().__init__(message)
+        self.pos = pos
+        self.diagnostics = diagnostics
+
+class Diagnostic(namedtuple('Diagnostic',
+                             ['kind', 'message', 'pos', 'line', 'column', 'expected'])):
+    """
+    Error that a parse recovered from: kind is 'lexical' or 'syntax', pos
+    the position of the illegal character or unexpected token (the end of
+    the input at EOF) and line and column its numbers from 1. expected
+    holds the token types the parser could take there, '$end' for the end
+    of the input
+    """
+    __slots__ = ()
+
+def _strict_error(p):
+    if p:
+        raise ParseError(f"Syntax error at '{p.value}'", p.lexpos)
+    raise ParseError("Syntax error at EOF")
+
+class LineIndex:
+    """
+    Maps positions in a text to line and column numbers (both from 1). The
+    offsets of the newlines are collected when a position is first looked up
+    """
+    def __init__(self, data):
+        self.data = data
+        self.newlines = None
+
+    def offsets(self):
+        if self.newlines is None:
+            newline = '\n' if isinstance(self.data, str) else b'\n'
+            self.newlines = [m.start() for m in re.finditer(re.escape(newline), self.data)]
+        return self.newlines
+
+    def lineno(self, pos):
+        return bisect.bisect_left(self.offsets(), pos) + 1
+
+    def column(self, pos):
+        line = bisect.bisect_left(self.offsets(), pos)
+        return pos - (self.newlines[line - 1] if line else -1)
+
+_token_lineno = lex.LexToken.lineno
+
+class ProtoToken(lex.LexToken):
+    """
+    Token of ProtoScanner, the line number is looked up from the position
+    when it is first read
+    """
+    __slots__ = ()
 
     @property
-    def use_entire_file(self):
-        return self.__use_entire_file
+    def lineno(self):
+        try:
+            return _token_lineno.__get__(self)
+        except AttributeError:
+            lineno = self.lexer.lines.lineno(self.lexpos)
+            _token_lineno.__set__(self, lineno)
+            return lineno
+
+    @lineno.setter
+    def lineno(self, lineno):
+        _token_lineno.__set__(self, lineno)
+
+class ProtoScanner:
+    """
+    Tokenizer equivalent to the lexer built from the ProtoParser rules that
+    matches the whole input with one regular expression. scan() generates
+    compact (type id, start, end) tuples, input() and token() provide the
+    lexer interface used by the parser.
+
+    The input is a str or a bytes-like object (bytes, bytearray, memoryview,
+    mmap) holding UTF-8 text, which is matched in place. Only the values of
+    the tokens are decoded
+    """
+    # Token types by type id
+    types = ('STRING', 'FLOAT', 'INTEGER', 'NAME', 'BOOL') + tuple(ProtoParser.literals)
+    STRING, FLOAT, INTEGER, NAME, BOOL = range(5)
+    ERROR = len(types)
+
+    # The rules in the order the lexer tries them
+    regex, kinds = master_regex(
+        [(STRING, ProtoParser.t_STRING.__doc__),
+         (FLOAT, ProtoParser.t_FLOAT),
+         (INTEGER, ProtoParser.t_INTEGER),
+         (NAME, ProtoParser.t_NAME),
+         (BOOL, ProtoParser.t_BOOL)] +
+        [(i, re.escape(c)) for i, c in enumerate(ProtoParser.literals, BOOL + 1)] +
+        [(ERROR, '[^%s]' % re.escape(ProtoParser.t_ignore))], ProtoParser.t_ignore, re.VERBOSE)
+    bytes_regex = re.compile(regex.pattern.encode('ascii'), regex.flags & ~re.UNICODE)
+    line = re.compile('[^\n]*')
+    bytes_line = re.compile(b'[^\n]*')
+
+    def __init__(self, errorf=None):
+        self.errorf = errorf
+        self.lexdata = None
+        self.lexpos = 0
+        self.lines = LineIndex('')
+        self.stream = iter(())
 
     @property
-    def clang_format_path(self):
-        return self.__clang_format_path or 'clang-format'
+    def lineno(self):
+        return self.lines.lineno(self.lexpos)
+
+    def scan(self, data, start=0, end=None):
+        """
+        Generate the tokens of data, or of the part of it from start to end,
+        as (type id, start, end) tuples
+        """
+        kinds = self.kinds
+        ntypes = len(self.types)
+        self.lines = LineIndex(data)
+        regex = self.regex if isinstance(data, str) else self.bytes_regex
+        end = len(data) if end is None else end
+        while True:
+            for m in regex.finditer(data, start, end):
+                i = m.lastindex
+                kind = kinds[i]
+                if kind < ntypes:
+                    yield (kind,) + m.span(i)
+                else:
+                    start, _ = self.error(data, m.start(i), end)
+                    break
+            else:
+                return
+
+    def tokens(self, data, start=0, end=None):
+        """
+        Generate the tokens of data, or of the part of it from start to end,
+        as ProtoToken objects
+        """
+        kinds = self.kinds
+        types = self.types
+        ntypes = len(types)
+        STRING = self.STRING
+        self.lines = LineIndex(data)
+        text = isinstance(data, str)
+        regex = self.regex if text else self.bytes_regex
+        end = len(data) if end is None else end
+        while True:
+            for m in regex.finditer(data, start, end):
+                i = m.lastindex
+                kind = kinds[i]
+                if kind < ntypes:
+                    tok = ProtoToken()
+                    tok.type = types[kind]
+                    value = m.group(i)
+                    if not text:
+                        # Undecodable bytes can only be in strings, they are kept as escapes
+                        value = value.decode('utf-8', 'backslashreplace')
+                    tok.value = value if kind != STRING else ProtoString(value)
+                    tok.lexpos, self.lexpos = m.span(i)
+                    tok.lexer = self
+                    yield tok
+                else:
+                    start, tok = self.error(data, m.start(i), end)
+                    if tok is not None:
+                        yield tok
+                    break
+            else:
+                return
+
+    def error(self, data, pos, end=None):
+        """
+        Report the illegal character at pos to errorf, which may skip it
+        (and more) with skip() and return a token for it as in a PLY lexer:
+        returns the position to scan on from then and that token, otherwise
+        raises LexError
+        """
+        if end is None:
+            end = len(data)
+        if isinstance(data, str):
+            rest = data[pos:end]
+        else:
+            # The rest of the line only, the input may be a file mapped in memory
+            rest = self.bytes_line.match(data, pos, end).group().decode('utf-8', 'backslashreplace')
+        self.lexpos = pos
+        if self.errorf:
+            tok = ProtoToken()
+            tok.type = 'error'
+            tok.value = rest
+            tok.lexpos = pos
+            tok.lexer = self
+            tok = self.errorf(tok)
+            if self.lexpos > pos:
+                return self.lexpos, tok
+        raise lex.LexError(f"Scanning error. Illegal character {rest[0]!r}", rest)
+
+    def skip(self, n):
+        self.lexpos += n
+
+    def line_end(self, pos):
+        """
+        The position of the end of the line at pos in the input
+        """
+        line = self.line if isinstance(self.lexdata, str) else self.bytes_line
+        return line.match(self.lexdata, pos).end()
+
+    def input(self, data, start=0, end=None):
+        self.lexdata = data
+        self.lexpos = start
+        self.lines = LineIndex(data)
+        self.stream = self.tokens(data, start, end)
+
+    def token(self):
+        return next(self.stream, None)
+
+class Tape:
+    """
+    Flat document of a debug string, with a node per field in input order
+    stored in array columns: kinds holds the token type id of a literal or
+    MESSAGE, depths the nesting depth, names the index of the field name in
+    symbols, starts and ends the span of the literal (of the braces of a
+    message) in data, and skips the index of the node after the field,
+    which is after the whole submessage for a message
+    """
+    MESSAGE = ProtoScanner.ERROR + 1
+
+    def __init__(self, data):
+        self.data = data
+        self.symbols = []
+        self.kinds = array('B')
+        self.depths = array('I')
+        self.names = array('I')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.skips = array('I')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def name(self, i):
+        return self.symbols[self.names[i]]
+
+    def value(self, i):
+        """
+        The value of the literal field i, a ProtoString for a string
+        """
+        value = _text(self.data, self.starts[i], self.ends[i])
+        return ProtoString(value) if self.kinds[i] == ProtoScanner.STRING else value
+
+    def children(self, i=None):
+        """
+        Generate the indexes of the fields of the message node i, or of the
+        top level fields
+        """
+        j, end = (0, len(self)) if i is None else (i + 1, self.skips[i])
+        skips = self.skips
+        while j < end:
+            yield j
+            j = skips[j]
+
+    def emit(self, handler, sort_keys=False):
+        """
+        Call the methods of the ProtoHandler handler for the messages and
+        fields of the document, as FastParser.parse_events() does. With
+        sort_keys, the fields of every message are sorted by name
+        """
+        MESSAGE = self.MESSAGE
+        kinds = self.kinds
+
+        def fields(i):
+            children = self.children(i)
+            return iter(sorted(children, key=self.name) if sort_keys else children)
+
+        handler.start_message(None)
+        # The fields left to emit of every open message
+        stack = [fields(None)]
+        while stack:
+            i = next(stack[-1], None)
+            if i is None:
+                stack.pop()
+                handler.end_message()
+            elif kinds[i] == MESSAGE:
+                handler.start_message(self.name(i))
+                stack.append(fields(i))
+            else:
+                handler.field(self.name(i), self.value(i))
+
+    def to_message(self):
+        """
+        The document as a Message tree
+        """
+        messages = [Message()]
+        for i in range(len(self)):
+            del messages[self.depths[i] + 1:]
+            if self.kinds[i] == self.MESSAGE:
+                message = Message()
+                messages[-1].append(self.name(i), message)
+                messages.append(message)
+            else:
+                messages[-1].append(self.name(i), self.value(i))
+        return messages[0]
+
+class ProtoHandler:
+    """
+    Receives the messages and fields of a debug string in input order from
+    FastParser.parse_events(), the whole debug string being a message
+    without a name. The methods do nothing unless overridden
+    """
+    def start_message(self, name):
+        pass
+
+    def field(self, name, value):
+        """
+        A literal field, value is its text as in a Message
+        """
+        pass
+
+    def end_message(self):
+        pass
+
+class MessageHandler(ProtoHandler):
+    """
+    Builds the Message of the events, as FastParser.parse() returns it
+    """
+    def __init__(self):
+        self.message = None
+        self.__stack = []
+
+    def start_message(self, name):
+        message = Message()
+        if self.__stack:
+            self.__stack[-1].append(name, message)
+        else:
+            self.message = message
+        self.__stack.append(message)
+
+    def field(self, name, value):
+        self.__stack[-1].append(name, value)
+
+    def end_message(self):
+        self.__stack.pop()
+
+class FastParser:
+    """
+    Parser equivalent to ProtoParser that reads the tokens of ProtoScanner
+    straight from its regular expression and descends into the objects
+    iteratively, with an explicit stack of the enclosing objects. It needs
+    no tables; when a parse that is not strict fails, ProtoParser parses the
+    input again to report the errors and recover from them as usual
+    """
+    # Parser states: expecting a key (or '}'), ':' or '{' after a key, a
+    # literal after ':', and nothing after the top level object
+    KEY, AFTER_KEY, VALUE, END = range(4)
+    LBRACE = ProtoScanner.types.index('{')
+    RBRACE = ProtoScanner.types.index('}')
+    COLON = ProtoScanner.types.index(':')
+
+    def parse(self, s, start=0, end=None, strict=False, diagnostics=None):
+        """
+        Parse s, or the part of it from start to end. A strict parse reports
+        nothing and raises LexError or ParseError on the first error,
+        otherwise ProtoParser recovers from them as its parse() does
+        """
+        if strict:
+            return self.__parse(s, start, end)
+        try:
+            return self.__parse(s, start, end)
+        except (lex.LexError, ParseError):
+            return get_parser().parse(s, start, end, diagnostics=diagnostics)
+
+    def __parse(self, data, start, end):
+        KEY, AFTER_KEY, VALUE, END = self.KEY, self.AFTER_KEY, self.VALUE, self.END
+        LBRACE, RBRACE, COLON = self.LBRACE, self.RBRACE, self.COLON
+        STRING, INTEGER, NAME, BOOL = (ProtoScanner.STRING, ProtoScanner.INTEGER,
+                                       ProtoScanner.NAME, ProtoScanner.BOOL)
+        kinds = ProtoScanner.kinds
+        text = isinstance(data, str)
+        regex = ProtoScanner.regex if text else ProtoScanner.bytes_regex
+        if end is None:
+            end = len(data)
+
+        obj = Message()
+        # (enclosing object, key) of every open object, (None, None) for
+        # braces around the top level object
+        stack = []
+        key = None
+        state = KEY
+        for m in regex.finditer(data, start, end):
+            i = m.lastindex
+            kind = kinds[i]
+            if state == KEY:
+                if kind == NAME or kind == INTEGER:
+                    key = m.group(i) if text else m.group(i).decode('utf-8', 'backslashreplace')
+                    state = AFTER_KEY
+                elif kind == RBRACE and stack:
+                    value = obj
+                    obj, key = stack.pop()
+                    if obj is None:
+                        obj = value
+                        state = END
+                    else:
+                        obj.append(key, value)
+                elif kind == LBRACE and not stack and not obj:
+                    stack.append((None, None))
+                else:
+                    self.__error(data, m, end)
+            elif state == AFTER_KEY:
+                if kind == COLON:
+                    state = VALUE
+                elif kind == LBRACE:
+                    stack.append((obj, key))
+                    obj = Message()
+                    state = KEY
+                else:
+                    self.__error(data, m, end)
+            elif state == VALUE:
+                if kind <= BOOL:
+                    value = m.group(i) if text else m.group(i).decode('utf-8', 'backslashreplace')
+                    obj.names.append(key)
+                    obj.values.append(value if kind != STRING else ProtoString(value))
+                    state = KEY
+                else:
+                    self.__error(data, m, end)
+            else:
+                self.__error(data, m, end)
+        if state == END or state == KEY and obj and not stack:
+            return obj
+        raise ParseError("Syntax error at EOF")
+
+    def parse_tape(self, s, start=0, end=None):
+        """
+        Parse s, or the part of it from start to end, to a Tape. Raises
+        LexError or ParseError on the first error
+        """
+        KEY, AFTER_KEY, VALUE, END = self.KEY, self.AFTER_KEY, self.VALUE, self.END
+        LBRACE, RBRACE, COLON = self.LBRACE, self.RBRACE, self.COLON
+        INTEGER, NAME, BOOL = ProtoScanner.INTEGER, ProtoScanner.NAME, ProtoScanner.BOOL
+        MESSAGE = Tape.MESSAGE
+        kinds = ProtoScanner.kinds
+        text = isinstance(s, str)
+        regex = ProtoScanner.regex if text else ProtoScanner.bytes_regex
+        if end is None:
+            end = len(s)
+
+        tape = Tape(s)
+        add_kind, add_depth, add_name = tape.kinds.append, tape.depths.append, tape.names.append
+        add_start, add_end, add_skip = tape.starts.append, tape.ends.append, tape.skips.append
+        skips, ends = tape.skips, tape.ends
+        # Field names by their index in tape.symbols
+        symbols = {}
+        # Tape index of every open message, -1 for braces around the top level
+        stack = []
+        depth = 0
+        count = 0
+        name = None
+        state = KEY
+        for m in regex.finditer(s, start, end):
+            i = m.lastindex
+            kind = kinds[i]
+            if state == KEY:
+                if kind == NAME or kind == INTEGER:
+                    key = m.group(i)
+                    name = symbols.get(key)
+                    if name is None:
+                        name = symbols[key] = len(symbols)
+                        tape.symbols.append(key if text else key.decode('utf-8', 'backslashreplace'))
+                    state = AFTER_KEY
+                elif kind == RBRACE and stack:
+                    node = stack.pop()
+                    if node < 0:
+                        state = END
+                    else:
+                        skips[node] = count
+                        ends[node] = m.end(i)
+                        depth -= 1
+                elif kind == LBRACE and not stack and not count:
+                    stack.append(-1)
+                else:
+                    self.__error(s, m, end)
+            elif state == AFTER_KEY:
+                if kind == COLON:
+                    state = VALUE
+                elif kind == LBRACE:
+                    add_kind(MESSAGE)
+                    add_depth(depth)
+                    add_name(name)
+                    add_start(m.start(i))
+                    add_end(0)
+                    add_skip(0)
+                    stack.append(count)
+                    count += 1
+                    depth += 1
+                    state = KEY
+                else:
+                    self.__error(s, m, end)
+            elif state == VALUE:
+                if kind <= BOOL:
+                    add_kind(kind)
+                    add_depth(depth)
+                    add_name(name)
+                    add_start(m.start(i))
+                    add_end(m.end(i))
+                    count += 1
+                    add_skip(count)
+                    state = KEY
+                else:
+                    self.__error(s, m, end)
+            else:
+                self.__error(s, m, end)
+        if state == END or state == KEY and count and not stack:
+            return tape
+        raise ParseError("Syntax error at EOF")
+
+    def parse_events(self, s, handler, start=0, end=None):
+        """
+        Parse s, or the part of it from start to end, calling the methods of
+        the ProtoHandler handler for its messages and fields without keeping
+        them. Raises LexError or ParseError on the first error, after the
+        events before it
+        """
+        parser = FeedParser(handler)
+        parser.feed(s, start, end)
+        parser.close()
+
+    def __error(self, data, m, end):
+        i = m.lastindex
+        if ProtoScanner.kinds[i] == ProtoScanner.ERROR:
+            ProtoScanner().error(data, m.start(i), end)
+        value = m.group(i) if isinstance(data, str) else m.group(i).decode('utf-8', 'backslashreplace')
+        raise ParseError(f"Syntax error at '{value}'", m.start(i))
+
+class FeedParser:
+    """
+    Push parser of a debug string that arrives in chunks, e.g. from a pipe
+    or a socket: feed() the chunks in order, str or bytes-like, and close()
+    at the end. The methods of the ProtoHandler handler are called as
+    FastParser.parse_events() calls them, for every token as soon as the
+    chunks hold all of it, so a top level field reaches the handler when it
+    closes. Only the end of a chunk that the next one may continue is kept:
+    a name or number with no white space or literal after it yet, or an
+    unterminated string. The chunks that continue it are kept as they are
+    and only searched for its end, so a string spanning many chunks is read
+    once. Raises LexError or ParseError on the first error, with the
+    positions in the input the chunks make up
+    """
+    # A character that no token but a string goes on after, and the input up
+    # to the last one
+    delimiter = {str: re.compile(r'[ \t\n{}\[\]:"]'), bytes: re.compile(rb'[ \t\n{}\[\]:"]')}
+    last_delimiter = {str: re.compile(r'.*[ \t\n{}\[\]:"]', re.S),
+                      bytes: re.compile(rb'.*[ \t\n{}\[\]:"]', re.S)}
+    # A string from its quote to the end of the input that may still be
+    # closed, and the part of one after that, with a backslash at the end
+    # that escapes the first character of the next chunk
+    open_string = {str: re.compile(r'"(?:[^\\\n"]|\\(?:.|\n))*(\\?)'),
+                   bytes: re.compile(rb'"(?:[^\\\n"]|\\(?:.|\n))*(\\?)')}
+    string_part = {str: re.compile(r'(?:[^\\\n"]|\\(?:.|\n))*(\\?)'),
+                   bytes: re.compile(rb'(?:[^\\\n"]|\\(?:.|\n))*(\\?)')}
+
+    def __init__(self, handler):
+        self.handler = handler
+        # The pieces of the token kept for the next chunk, whether it is an
+        # open string and if so whether it ends in an escaping backslash, and
+        # its position in the input
+        self.held = []
+        self.string = False
+        self.escaped = False
+        self.offset = None
+        # The parser state of FastParser.parse_events()
+        self.state = FastParser.KEY
+        self.depth = 0
+        self.braced = False
+        self.count = 0
+        self.key = None
+        handler.start_message(None)
+
+    def feed(self, data, start=0, end=None):
+        """
+        Parse the chunk data, or the part of it from start to end. Positions
+        in the input are those in data for the first chunk
+        """
+        if end is None:
+            end = len(data)
+        if self.offset is None:
+            self.offset = start
+        kind = _kind(data)
+        if self.held:
+            piece = data[start:end] if kind is str else bytes(data[start:end])
+            if not self.__token_ends(piece, kind):
+                self.held.append(piece)
+                return
+            # Joined once, as the token is complete
+            self.held.append(piece)
+            data = piece[:0].join(self.held)
+            start, end = 0, len(data)
+            self.held = []
+        offset = self.offset - start
+        m = self.last_delimiter[kind].match(data, start, end)
+        limit = m.end() if m else start
+        pos = self.__parse(data, start, limit, end, offset, False)
+        if pos < end:
+            self.held = [data[pos:end] if kind is str else bytes(data[pos:end])]
+            # Only a string is kept from before the last delimiter
+            self.string = pos < limit
+        self.offset = offset + pos
+
+    def close(self):
+        """
+        Parse the rest of the input, which ends here
+        """
+        data = self.held[0][:0].join(self.held) if self.held else ''
+        self.__parse(data, 0, len(data), len(data), self.offset or 0, True)
+        self.held = []
+        if (self.state == FastParser.END or
+                self.state == FastParser.KEY and self.count and not self.depth and not self.braced):
+            self.handler.end_message()
+            return
+        raise ParseError("Syntax error at EOF")
+
+    def __parse(self, data, start, limit, end, offset, final):
+        """
+        Parse the tokens of data from start to limit, returns the position
+        of the input to keep for the next chunk
+        """
+        KEY, AFTER_KEY, VALUE, END = FastParser.KEY, FastParser.AFTER_KEY, FastParser.VALUE, FastParser.END
+        LBRACE, RBRACE, COLON = FastParser.LBRACE, FastParser.RBRACE, FastParser.COLON
+        STRING, INTEGER, NAME, BOOL = (ProtoScanner.STRING, ProtoScanner.INTEGER,
+                                       ProtoScanner.NAME, ProtoScanner.BOOL)
+        kinds = ProtoScanner.kinds
+        text = isinstance(data, str)
+        regex = ProtoScanner.regex if text else ProtoScanner.bytes_regex
+
+        handler = self.handler
+        start_message, field, end_message = handler.start_message, handler.field, handler.end_message
+        state, depth, braced, count, key = self.state, self.depth, self.braced, self.count, self.key
+        try:
+            for m in regex.finditer(data, start, limit):
+                i = m.lastindex
+                kind = kinds[i]
+                if state == KEY:
+                    if kind == NAME or kind == INTEGER:
+                        key = m.group(i) if text else m.group(i).decode('utf-8', 'backslashreplace')
+                        state = AFTER_KEY
+                    elif kind == RBRACE and depth:
+                        depth -= 1
+                        end_message()
+                    elif kind == RBRACE and braced:
+                        state = END
+                    elif kind == LBRACE and not braced and not count:
+                        braced = True
+                    else:
+                        return self.__error(data, m, end, offset, final)
+                elif state == AFTER_KEY:
+                    if kind == COLON:
+                        state = VALUE
+                    elif kind == LBRACE:
+                        start_message(key)
+                        depth += 1
+                        count += 1
+                        state = KEY
+                    else:
+                        return self.__error(data, m, end, offset, final)
+                elif state == VALUE:
+                    if kind <= BOOL:
+                        value = m.group(i) if text else m.group(i).decode('utf-8', 'backslashreplace')
+                        field(key, value if kind != STRING else ProtoString(value))
+                        count += 1
+                        state = KEY
+                    else:
+                        return self.__error(data, m, end, offset, final)
+                else:
+                    return self.__error(data, m, end, offset, final)
+            return limit
+        finally:
+            self.state, self.depth, self.braced, self.count, self.key = state, depth, braced, count, key
+
+    def __token_ends(self, piece, kind):
+        """
+        Whether the token kept for the next chunk ends in the chunk piece: an
+        open string at its closing quote or at a newline, the others at a
+        delimiter
+        """
+        if not piece:
+            return False
+        if not self.string:
+            return self.delimiter[kind].search(piece) is not None
+        m = self.string_part[kind].match(piece, 1 if self.escaped else 0)
+        if m.end() < len(piece):
+            return True
+        self.escaped = m.end(1) > m.start(1)
+        return False
+
+    def __error(self, data, m, end, offset, final):
+        """
+        Raise the error of the token m, unless it is a string the next chunk
+        may close: returns its position then
+        """
+        i = m.lastindex
+        pos = m.start(i)
+        text = isinstance(data, str)
+        if ProtoScanner.kinds[i] == ProtoScanner.ERROR:
+            string = not final and self.open_string[str if text else bytes].fullmatch(data, pos, end)
+            if string:
+                self.escaped = string.end(1) > string.start(1)
+                return pos
+            ProtoScanner().error(data, pos, end)
+        value = m.group(i) if text else m.group(i).decode('utf-8', 'backslashreplace')
+        raise ParseError(f"Syntax error at '{value}'", offset + pos)
+
+# Prefix of a glog/absl log line: severity, date, time, thread id and
+# file:line, e.g. "I1018 01:23:45.678901 12345 server.cc:42] "
+_log_prefix = r'^[IWEF]\d{4}(?:\d{4})? \d\d:\d\d:\d\d\.\d{6} +\S+ +[^\s\]]+:\d+\] ?'
+_log_prefix_regex = {str: re.compile(_log_prefix, re.M),
+                     bytes: re.compile(_log_prefix.encode(), re.M)}
+_newline = {str: re.compile('\n'), bytes: re.compile(b'\n')}
+_indent = frozenset(' \t') | frozenset(b' \t')
+_trailing_space = frozenset(' \t\r\n') | frozenset(b' \t\r\n')
+
+def _kind(data):
+    return str if isinstance(data, str) else bytes
+
+def _text(data, start, end):
+    if isinstance(data, str):
+        return data[start:end]
+    return bytes(data[start:end]).decode('utf-8', 'backslashreplace')
+
+def log_payloads(data):
+    """
+    Generate the (start, end) spans of the messages of the glog/absl log
+    lines in data. A message ends at the next log line, so it includes the
+    continuation lines in between, but not the trailing white space
+    """
+    start = None
+    for m in _log_prefix_regex[_kind(data)].finditer(data):
+        if start is not None:
+            yield start, _rstrip(data, start, m.start())
+        start = m.end()
+    if start is not None:
+        yield start, _rstrip(data, start, len(data))
+
+def _rstrip(data, start, end):
+    while end > start and data[end - 1] in _trailing_space:
+        end -= 1
+    return end
+
+def _payload_start(data, start, end):
+    """
+    Position where the debug string of the log message from start to end
+    starts, or None if it has none. The message is tokenized once, and the
+    debug string is its longest tail of tokens that is a braced message or
+    several fields, starting at the start of the message, of a word of its
+    first line or of a continuation line, or a single submessage starting a
+    line. So a single field ending a sentence ("port: 8080") is left as it
+    is, and so is the prose before a braced message ("Got response { ... }")
+    """
+    kinds = ProtoScanner.kinds
+    regex = ProtoScanner.regex if isinstance(data, str) else ProtoScanner.bytes_regex
+    newline = _newline[_kind(data)]
+    tokens = []
+    # The position of every token where the debug string may start, None
+    # for the others, and the indexes of those starting a line
+    positions = []
+    line_starts = set()
+    first_line = True
+    for m in regex.finditer(data, start, end):
+        pos = m.start(m.lastindex)
+        space = m.start() < pos
+        line_break = space and newline.search(data, m.start(), pos) is not None
+        first_line = first_line and not line_break
+        if not tokens or line_break:
+            line_starts.add(len(tokens))
+            # With the indentation of a continuation line
+            while line_break and data[pos - 1] in _indent:
+                pos -= 1
+        positions.append(pos if not tokens or line_break or space and first_line else None)
+        tokens.append(kinds[m.lastindex])
+
+    # The tokens are read backwards, where the grammar needs no lookahead:
+    # a literal or '}' ends a field, and a ':' or '{' follows its key
+    BOOL, INTEGER, NAME = ProtoScanner.BOOL, ProtoScanner.INTEGER, ProtoScanner.NAME
+    LBRACE, RBRACE, COLON = FastParser.LBRACE, FastParser.RBRACE, FastParser.COLON
+    FIELD_END, AFTER_VALUE, AFTER_KEY = range(3)
+    state = FIELD_END
+    depth = 0
+    fields = 0
+    # Whether the last token closes the top level message being read, and
+    # whether the top level field being read is a submessage
+    braced = False
+    submessage = False
+    found = None
+    last = len(tokens) - 1
+    for i in range(last, -1, -1):
+        kind = tokens[i]
+        if state == FIELD_END:
+            if kind <= BOOL:
+                if not depth:
+                    submessage = False
+                state = AFTER_VALUE
+            elif kind == RBRACE:
+                if not depth:
+                    braced = i == last
+                depth += 1
+            elif kind == LBRACE and depth:
+                depth -= 1
+                if not depth:
+                    if braced and not fields and positions[i] is not None:
+                        found = positions[i]
+                    submessage = True
+                state = AFTER_KEY
+            else:
+                break
+        elif state == AFTER_VALUE:
+            if kind != COLON:
+                break
+            state = AFTER_KEY
+        else:
+            if kind != NAME and kind != INTEGER:
+                break
+            state = FIELD_END
+            if not depth:
+                fields += 1
+                if (fields > 1 and positions[i] is not None) or (submessage and i in line_starts):
+                    found = positions[i]
+    return found
+
+_parser = None
+_parser_lock = threading.Lock()
+_thread_parsers = threading.local()
+
+def shared_parser():
+    """
+    Return the shared ProtoParser, building it on first use. Callers arriving
+    while another thread builds it wait for that build
+    """
+    global _parser
+    if _parser is None:
+        with _parser_lock:
+            if _parser is None:
+                _parser = ProtoParser()
+    return _parser
+
+def get_parser():
+    """
+    Return the ProtoParser of the calling thread, a clone of the shared one
+    """
+    parser = getattr(_thread_parsers, 'parser', None)
+    if parser is None:
+        parser = _thread_parsers.parser = shared_parser().clone()
+    return parser
+
+_fast_parser = FastParser()
+
+def get_engine(name):
+    """
+    Return the parser of the engine name for the calling thread: its
+    ProtoParser for 'ply', otherwise FastParser, which keeps no state between
+    calls and is shared by all threads
+    """
+    return get_parser() if name == 'ply' else _fast_parser
+
+def warm_up():
+    """
+    Build the shared ProtoParser in a background thread
+    """
+    threading.Thread(target=shared_parser, name='pretty-protobuf-warm-up', daemon=True).start()
+
+class FormatOptions(namedtuple('FormatOptions',
+                               ['indent', 'sort_keys', 'decode_strings', 'bytes_format',
+                                'log_payloads', 'engine'],
+                               defaults=[4, False, False, 'escape', False, 'fast'])):
+    """
+    Immutable options of the debug string formatter. Strings are copied
+    verbatim unless decode_strings is set, strings holding binary data are
+    shown as in the input ('escape'), as 'hex' or as 'base64'. With
+    log_payloads the input is a log, only the debug strings in the messages
+    of its log lines are formatted. engine selects the parser, 'fast' for
+    FastParser or 'ply' for ProtoParser
+    """
+    __slots__ = ()
+
+class FormatHandler(ProtoHandler):
+    """
+    Formats the events of a debug string as indented text, the formatters
+    below all produce their output through it
+    """
+    def __init__(self, options=FormatOptions(), write=None):
+        self.__options = options
+        self.__lines = []
+        self.__depth = 0
+        # With write, every line is written with its newline as soon as it
+        # is formatted instead of being kept for format()
+        self.__add = self.__lines.append if write is None else lambda line: write(line + '\n')
+
+    def start_message(self, name):
+        spaces = ' ' * (self.__options.indent * self.__depth)
+        self.__add(f'{spaces}{name} {{' if name else f'{spaces}{{')
+        self.__depth += 1
+
+    def field(self, name, value):
+        if isinstance(value, ProtoString):
+            value = value.display(self.__options)
+        self.__add(f'{" " * (self.__options.indent * self.__depth)}{name}: {value}')
+
+    def end_message(self):
+        self.__depth -= 1
+        self.__add(f'{" " * (self.__options.indent * self.__depth)}}}')
+
+    def format(self):
+        return '\n'.join(self.__lines)
+
+class CheckpointHandler(FormatHandler):
+    """
+    FormatHandler that keeps the lines with their newline in lines, and in
+    ends the number of lines when every top level field ends
+    """
+    def __init__(self, options=FormatOptions()):
+        self.lines = []
+        self.ends = []
+        self.__depth = 0
+        super().__init__(options, self.lines.append)
+
+    def start_message(self, name):
+        super().start_message(name)
+        self.__depth += 1
+
+    def field(self, name, value):
+        super().field(name, value)
+        if self.__depth == 1:
+            self.ends.append(len(self.lines))
+
+    def end_message(self):
+        super().end_message()
+        self.__depth -= 1
+        if self.__depth == 1:
+            self.ends.append(len(self.lines))
+
+    def checkpoints(self):
+        """
+        The positions in the output of the newlines after the top level
+        fields
+        """
+        sizes = list(accumulate(map(len, self.lines)))
+        return [sizes[n - 1] - 1 for n in self.ends]
 
 class DictFormatter:
-    def __init__(self, obj):
-        self.__settings = ProtoSettings()
+    def __init__(self, obj, options=FormatOptions()):
+        self.__options = options
         self.__obj = obj
-        self.__lst = []
-        self.__seperator = ' '
 
     def format(self):
-        self.__format('', self.__obj)
-        return '\n'.join(self.__lst)
-
-    def __format(self, name, obj, times=0):
-        if isinstance(obj, dict):
-            spaces = self.__seperator * times
-            self.__append(f'{spaces}{name} {{' if name else f'{spaces}{{')
-            if self.__settings.sort_keys:
-                obj = dict(sorted(obj.items(), key=lambda x: x[0]))
-            for k, v in obj.items():
-                self.__format(k, v, times + self.__settings.spaces)
-            self.__append(f'{spaces}}}')
+        handler = FormatHandler(self.__options)
+        self.__format(None, self.__obj, handler)
+        return handler.format()
+
+    def __format(self, name, obj, handler):
+        if isinstance(obj, (Message, dict)):
+            handler.start_message(name)
+            pairs = obj if isinstance(obj, Message) else obj.items()
+            if self.__options.sort_keys:
+                pairs = sorted(pairs, key=lambda x: x[0])
+            for k, v in pairs:
+                self.__format(k, v, handler)
+            handler.end_message()
         elif isinstance(obj, list):
             for item in obj:
-                self.__format(name, item, times)
+                self.__format(name, item, handler)
         elif isinstance(obj, str):
-            self.__append(f'{self.__seperator * times}{name}: {obj}')
+            handler.field(name, obj)
         else:
             pass
 
-    def __append(self, s):
-        self.__lst.append(s)
+class TapeFormatter:
+    """
+    Formats a Tape like DictFormatter formats the Message of the same debug
+    string, without building the message
+    """
+    def __init__(self, tape, options=FormatOptions()):
+        self.__options = options
+        self.__tape = tape
 
-class ProtoFormatter:
-    parser = ProtoParser()
+    def format(self):
+        handler = FormatHandler(self.__options)
+        self.__tape.emit(handler, self.__options.sort_keys)
+        return handler.format()
 
-    def __init__(self, debug_str):
+class FormatResult(namedtuple('FormatResult', ['text', 'diagnostics'])):
+    """
+    Formatted text of a debug string, which holds what could be parsed, and
+    the Diagnostic of every error recovered from
+    """
+    __slots__ = ()
+
+class ProtoFormatter:
+    def __init__(self, debug_str, options=FormatOptions()):
         # Keep original debug string
         self.__debug_string = debug_str
+        self.__options = options
 
     def format(self):
+        """
+        Format the debug string, returns '' if it has errors: what could be
+        parsed is returned by format_result() with them
+        """
+        result = self.format_result()
+        return '' if result.diagnostics else result.text
+
+    def format_result(self):
+        """
+        Format the debug string, returns a FormatResult. The debug strings
+        of log payloads are formatted only without errors, so none are
+        reported for them
+        """
+        diagnostics = []
+        if self.__options.log_payloads:
+            return FormatResult(self.__format_log(), diagnostics)
+        return FormatResult(self.__format(self.__debug_string, diagnostics=diagnostics), diagnostics)
+
+    def __format(self, data, start=0, end=None, strict=False, diagnostics=None):
+        """
+        Format the debug string in data, or in the part of it from start to
+        end. The fast engine formats its events as they are parsed, or its
+        Tape to sort the keys, a malformed one is parsed again by ProtoParser
+        unless strict, the errors are appended to diagnostics
+        """
+        if self.__options.engine != 'ply':
+            try:
+                if self.__options.sort_keys:
+                    tape = get_engine('fast').parse_tape(data, start, end)
+                    return TapeFormatter(tape, self.__options).format()
+                handler = FormatHandler(self.__options)
+                get_engine('fast').parse_events(data, handler, start, end)
+                return handler.format()
+            except (lex.LexError, ParseError):
+                if strict:
+                    raise
+        obj = get_parser().parse(data, start, end, strict, diagnostics)
+        return DictFormatter(obj, self.__options).format()
+
+    def __format_log(self):
+        data = self.__debug_string
+        out = []
+        pos = 0
+        for start, end in log_payloads(data):
+            begin = _payload_start(data, start, end)
+            if begin is None:
+                continue
+            try:
+                formatted = self.__format(data, begin, end, strict=True)
+            except (lex.LexError, ParseError):
+                continue
+            out.append(_text(data, pos, begin))
+            out.append(formatted)
+            pos = end
+        out.append(_text(data, pos, len(data)))
+        return ''.join(out)
+
+def _common_prefix(a, b, block=1 << 16):
+    """
+    Length of the common prefix of a and b, compared a block at a time
+    """
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i:i + block] == b[i:i + block]:
+        i += block
+    if i >= n:
+        return n
+    # The first difference is in [lo, hi)
+    lo, hi = i, min(i + block, n)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+def _common_suffix(a, b, n, block=1 << 16):
+    """
+    Length of the common suffix of a and b, at most n
+    """
+    la, lb = len(a), len(b)
+    i = 0
+    while i < n:
+        j = min(i + block, n)
+        if a[la - j:la - i] != b[lb - j:lb - i]:
+            break
+        i = j
+    else:
+        return n
+    # The last difference is at a suffix length in [lo, hi)
+    lo, hi = i, min(i + block, n)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if a[la - mid:la - lo] == b[lb - mid:lb - lo]:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+class IncrementalFormatter:
+    """
+    Formats the text of a view again after an edit, parsing only from the
+    last top level field that ends before the edit to the first one after it
+    where the parser is back at the top level. It keeps the text it output
+    and checkpoints at the ends of its top level fields: the parser state
+    there is always the top level of a braced message, so the positions are
+    enough. The text is assumed to be the last output with the edits made
+    since, which formats to itself outside of them. That holds unless the
+    keys are sorted or the strings decoded; those options, log payloads and
+    the 'ply' engine format the whole text every time
+    """
+    def __init__(self, options=FormatOptions()):
+        self.options = options
+        self.text = None
+        self.checkpoints = array('q')
+        self.diagnostics = []
+
+    def format(self, text):
+        """
+        Format text, returns (start, end, output) where text with
+        text[start:end] replaced by output is the formatted text, or None if
+        it has errors, which are left in diagnostics
+        """
+        self.diagnostics = []
+        o = self.options
+        if o.sort_keys or o.decode_strings or o.log_payloads or o.engine == 'ply':
+            return self.__format_whole(text)
+        if self.text is not None:
+            edit = self.__resume(text)
+            if edit:
+                return edit
+        handler = CheckpointHandler(o)
         try:
-            obj = self.parser.parse(self.__debug_string)
-            return DictFormatter(obj).format()
-        except lex.LexError as err:
-            print(f'{self.__debug_string = }\n{err = }')
-        return ''
+            _fast_parser.parse_events(text, handler)
+        except (lex.LexError, ParseError):
+            edit = self.__format_whole(text)
+            # The checkpoints stay valid if the text is left as it is
+            if edit:
+                self.text = None
+            return edit
+        output = ''.join(handler.lines)[:-1]
+        self.text = output
+        self.checkpoints = array('q', handler.checkpoints())
+        return 0, len(text), output
+
+    def __format_whole(self, text):
+        result = ProtoFormatter(text, self.options).format_result()
+        self.diagnostics = result.diagnostics
+        if result.diagnostics or not result.text:
+            return None
+        return 0, len(text), result.text
+
+    def __resume(self, text):
+        """
+        Format text from the checkpoints around its difference with the last
+        output, returns None if it cannot be resumed
+        """
+        old = self.text
+        if text == old:
+            return 0, 0, ''
+        prefix = _common_prefix(old, text)
+        suffix = _common_suffix(old, text, min(len(old), len(text)) - prefix)
+        delta = len(text) - len(old)
+        checkpoints = self.checkpoints
+
+        handler = CheckpointHandler(self.options)
+        parser = FeedParser(handler)
+        # The last checkpoint before the edit, the newline at it is unchanged
+        i = bisect.bisect_left(checkpoints, prefix)
+        start = checkpoints[i - 1] if i else 0
+        if i:
+            parser.braced = True
+            parser.count = 1
+        # Try the checkpoints after the edit, at increasing distances
+        j = bisect.bisect_left(checkpoints, len(old) - suffix)
+        step = 1
+        pos = start
+        try:
+            while j < len(checkpoints):
+                end = checkpoints[j] + delta
+                parser.feed(text, pos, end + 1)
+                pos = end + 1
+                # Not inside a string the next line may still close
+                if (parser.state == FastParser.KEY and not parser.depth and
+                        parser.braced and parser.count and not parser.held):
+                    break
+                j += step
+                step *= 2
+            else:
+                parser.feed(text, pos)
+                parser.close()
+                end = len(text)
+        except (lex.LexError, ParseError):
+            return None
+
+        output = ''.join(handler.lines)[:-1]
+        # The checkpoint before the edit keeps its newline, the first line
+        # is the "{" of the top level message
+        skip = 1 if start else 0
+        output = output[skip:]
+        found = array('q', (start - skip + p for p in handler.checkpoints()))
+        if end < len(text):
+            shift = start + len(output) - (end - delta)
+            found.extend(map(shift.__add__, checkpoints[j + 1:]))
+        self.checkpoints = checkpoints[:i] + found
+        self.text = text[:start] + output + text[end:]
+        return start, end, output
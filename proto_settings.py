@@ -0,0 +1,63 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import sublime
+from .proto_formatter import FormatOptions
+
+class ProtoSettings:
+    __instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls.__instance is None:
+            cls.__instance = super().__new__(cls)
+        return cls.__instance
+
+    def __init__(self):
+        self.__settings = sublime.load_settings('Pretty Protobuf.sublime-settings')
+        self.__spaces = self.__settings.get('indent', 4)
+        self.__sort_keys = self.__settings.get('sort_keys', False)
+        self.__decode_strings = self.__settings.get('decode_strings', False)
+        self.__bytes_format = self.__settings.get('bytes_format', 'escape')
+        self.__log_payloads = self.__settings.get('log_payloads', False)
+        self.__engine = self.__settings.get('engine', 'fast')
+        self.__use_entire_file = self.__settings.get('use_entire_file_if_no_selection', True)
+        self.__clang_format_path = self.__settings.get('clang_format_path', '')
+
+    @property
+    def spaces(self):
+        return self.__spaces
+
+    @property
+    def sort_keys(self):
+        return self.__sort_keys
+
+    @property
+    def decode_strings(self):
+        return self.__decode_strings
+
+    @property
+    def bytes_format(self):
+        return self.__bytes_format
+
+    @property
+    def log_payloads(self):
+        return self.__log_payloads
+
+    @property
+    def engine(self):
+        return self.__engine
+
+    @property
+    def use_entire_file(self):
+        return self.__use_entire_file
+
+    @property
+    def clang_format_path(self):
+        return self.__clang_format_path or 'clang-format'
+
+    def format_options(self):
+        return FormatOptions(indent=self.__spaces, sort_keys=self.__sort_keys,
+                             decode_strings=self.__decode_strings,
+                             bytes_format=self.__bytes_format,
+                             log_payloads=self.__log_payloads,
+                             engine=self.__engine)
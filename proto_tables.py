@@ -0,0 +1,34 @@
+# This file is generated by tools/gen_tables.py. Do not edit!
+_lextabversion = '4.0'
+_lexsignature = 'BOOL NAME FLOAT INTEGER STRING\n{}[]:\n64\nINITIAL:inclusive\nt_STRING:\\"([^\\\\\\n]|(\\\\(.|\\n)))*?\\"\nt_FLOAT:((\\d+)(\\.\\d+)(e(\\+|-)?(\\d+))?)|((\\d+)e(\\+|-)?(\\d+))([lL]|[fF])\nt_INTEGER:-?([0-9]+)(\\.[0-9]+)?([eE][-+]?[0-9]+)?\nt_NAME:[a-zA-Z_][a-zA-Z0-9_]*\nt_BOOL:true|false\nignore: \t\n'
+_lextokens = ('BOOL', 'FLOAT', 'INTEGER', 'NAME', 'STRING')
+_lexreflags = 64
+_lexliterals = '{}[]:'
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere = {'INITIAL': [('(?P<t_STRING>\\"([^\\\\\\n]|(\\\\(.|\\n)))*?\\")|(?P<t_FLOAT>((\\d+)(\\.\\d+)(e(\\+|-)?(\\d+))?)|((\\d+)e(\\+|-)?(\\d+))([lL]|[fF]))|(?P<t_INTEGER>-?([0-9]+)(\\.[0-9]+)?([eE][-+]?[0-9]+)?)|(?P<t_NAME>[a-zA-Z_][a-zA-Z0-9_]*)|(?P<t_BOOL>true|false)', [None, ('t_STRING', 'STRING'), None, None, None, (None, 'FLOAT'), None, None, None, None, None, None, None, None, None, None, None, (None, 'INTEGER'), None, None, None, (None, 'NAME'), (None, 'BOOL')], [None, 't_STRING', None, None, None, 't_FLOAT', None, None, None, None, None, None, None, None, None, None, None, 't_INTEGER', None, None, None, 't_NAME', 't_BOOL'])]}
+_lexstateignore = {'INITIAL': ' \t\n'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
+_tabversion = '4.0'
+_lr_signature = "BOOL FLOAT INTEGER NAME STRINGstatement : pair_list\n                     | objectkey : NAME\n               | INTEGERliteral : NAME\n                   | BOOL\n                   | FLOAT\n                   | INTEGER\n                   | STRINGpair : key ':' literal\n                | key objectpair : errorpair_list : pair\n                     | pair_list pairobject : '{' '}'\n                  | '{' pair_list '}'"
+_lr_action = {0: {'{': 5, 'error': 7, 'NAME': 8, 'INTEGER': 9}, 1: {'$end': 0}, 2: {'$end': -1, 'error': 7, 'NAME': 8, 'INTEGER': 9}, 3: {'$end': -2}, 4: {'error': -13, 'NAME': -13, 'INTEGER': -13, '$end': -13, '}': -13}, 5: {'}': 11, 'error': 7, 'NAME': 8, 'INTEGER': 9}, 6: {':': 13, '{': 5}, 7: {'error': -12, 'NAME': -12, 'INTEGER': -12, '$end': -12, '}': -12}, 8: {':': -3, '{': -3}, 9: {':': -4, '{': -4}, 10: {'error': -14, 'NAME': -14, 'INTEGER': -14, '$end': -14, '}': -14}, 11: {'$end': -15, 'error': -15, 'NAME': -15, 'INTEGER': -15, '}': -15}, 12: {'}': 15, 'error': 7, 'NAME': 8, 'INTEGER': 9}, 13: {'NAME': 17, 'BOOL': 18, 'FLOAT': 19, 'INTEGER': 20, 'STRING': 21}, 14: {'error': -11, 'NAME': -11, 'INTEGER': -11, '$end': -11, '}': -11}, 15: {'$end': -16, 'error': -16, 'NAME': -16, 'INTEGER': -16, '}': -16}, 16: {'error': -10, 'NAME': -10, 'INTEGER': -10, '$end': -10, '}': -10}, 17: {'error': -5, 'NAME': -5, 'INTEGER': -5, '$end': -5, '}': -5}, 18: {'error': -6, 'NAME': -6, 'INTEGER': -6, '$end': -6, '}': -6}, 19: {'error': -7, 'NAME': -7, 'INTEGER': -7, '$end': -7, '}': -7}, 20: {'error': -8, 'NAME': -8, 'INTEGER': -8, '$end': -8, '}': -8}, 21: {'error': -9, 'NAME': -9, 'INTEGER': -9, '$end': -9, '}': -9}}
+_lr_goto = {0: {'statement': 1, 'pair_list': 2, 'object': 3, 'pair': 4, 'key': 6}, 1: {}, 2: {'pair': 10, 'key': 6}, 3: {}, 4: {}, 5: {'pair_list': 12, 'pair': 4, 'key': 6}, 6: {'object': 14}, 7: {}, 8: {}, 9: {}, 10: {}, 11: {}, 12: {'pair': 10, 'key': 6}, 13: {'literal': 16}, 14: {}, 15: {}, 16: {}, 17: {}, 18: {}, 19: {}, 20: {}, 21: {}}
+_lr_productions = [
+  ("S' -> statement", "S'", 1, None, None, None),
+  ('statement -> pair_list', 'statement', 1, 'p_statement_expr', 'proto_formatter.py', 266),
+  ('statement -> object', 'statement', 1, 'p_statement_expr', 'proto_formatter.py', 267),
+  ('key -> NAME', 'key', 1, 'p_expression_key', 'proto_formatter.py', 272),
+  ('key -> INTEGER', 'key', 1, 'p_expression_key', 'proto_formatter.py', 273),
+  ('literal -> NAME', 'literal', 1, 'p_expression_literal', 'proto_formatter.py', 278),
+  ('literal -> BOOL', 'literal', 1, 'p_expression_literal', 'proto_formatter.py', 279),
+  ('literal -> FLOAT', 'literal', 1, 'p_expression_literal', 'proto_formatter.py', 280),
+  ('literal -> INTEGER', 'literal', 1, 'p_expression_literal', 'proto_formatter.py', 281),
+  ('literal -> STRING', 'literal', 1, 'p_expression_literal', 'proto_formatter.py', 282),
+  ('pair -> key : literal', 'pair', 3, 'p_expression_pair', 'proto_formatter.py', 288),
+  ('pair -> key object', 'pair', 2, 'p_expression_pair', 'proto_formatter.py', 289),
+  ('pair -> error', 'pair', 1, 'p_expression_pair_error', 'proto_formatter.py', 295),
+  ('pair_list -> pair', 'pair_list', 1, 'p_expression_pair_list', 'proto_formatter.py', 301),
+  ('pair_list -> pair_list pair', 'pair_list', 2, 'p_expression_pair_list', 'proto_formatter.py', 302),
+  ('object -> { }', 'object', 2, 'p_expression_object', 'proto_formatter.py', 311),
+  ('object -> { pair_list }', 'object', 3, 'p_expression_object', 'proto_formatter.py', 312),
+]
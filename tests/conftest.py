@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+# The tests share the package loader and the synthetic debug strings with the
+# benchmarks in tools/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
+
+import _package
+
+@pytest.fixture(scope='session')
+def proto_formatter():
+    return _package.load()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+"""
+The fast engine (FastParser) and the PLY engine (ProtoParser) parse debug
+strings to the same tree: synthetic debug strings as str and bytes, and
+malformed ones, which must fail at the same position in a strict parse and
+report the same errors otherwise. The Tape and the events of the fast
+engine hold the same tree and format to the same text, also when the input
+is fed to a FeedParser in chunks of random sizes. Errors recovered from are
+diagnosed the same by both engines, all of them in one pass, also when they
+are adjacent, and nothing is printed.
+"""
+
+import random
+
+import pytest
+
+from bench_tokenizer import debug_string
+
+SEEDS = range(4)
+MESSAGES = 50
+
+MALFORMED = [
+    '', '   ', '{', '}', '{ }', '{ } x: 1', '{ a: 1 } { }', 'a', 'a:', 'a: 1 :',
+    'a: { b: 1 }', 'a { b: 1', 'a { b: 1 } }', 'a: 1 { }', '1.5: 2', 'a: [1]',
+    'a: ]', '"s": 1', 'a: 1 b', 'a { b { c: 1 } d: }', 'a: 1 $ b: 2', 'a: @',
+    'a { b: 1 } c: "unterminated', 'true: false', '-1: -2 0 { }',
+]
+
+# Errors next to each other, with the (kind, position) of each
+ADJACENT = [
+    ('a: : b: : c: : d: 1', [('syntax', 3), ('syntax', 8), ('syntax', 13)]),
+    ('a: $ b: $ c: 1', [('lexical', 3), ('lexical', 8)]),
+    ('a: 1\nb: @\nc: 3', [('lexical', 8)]),
+    ('a: "x\nb: "y\nc: 3', [('lexical', 3), ('lexical', 9)]),
+    ('} } a: 1', [('syntax', 0), ('syntax', 2)]),
+    ('a: 1 } } b: 2', [('syntax', 5), ('syntax', 7)]),
+    ('a { b: : } c: : d: 1', [('syntax', 7), ('syntax', 14)]),
+    ('a: $ } b: 2', [('lexical', 3), ('syntax', 5)]),
+]
+
+def same_tree(a, b):
+    """
+    Whether a and b are equal with the same types and key order
+    """
+    if type(a) is not type(b):
+        return False
+    if hasattr(a, 'names'):
+        return same_tree(a.names, b.names) and same_tree(a.values, b.values)
+    if isinstance(a, dict):
+        return (list(a) == list(b) and
+                all(same_tree(v, b[k]) for k, v in a.items()))
+    if isinstance(a, list):
+        return len(a) == len(b) and all(map(same_tree, a, b))
+    return a == b
+
+def strict_result(parse, data, errors):
+    try:
+        return 'ok', parse(data)
+    except errors as err:
+        return type(err).__name__, getattr(err, 'pos', None)
+
+def events_parse(proto_formatter, fast):
+    def parse(data):
+        handler = proto_formatter.MessageHandler()
+        fast.parse_events(data, handler)
+        return handler.message
+    return parse
+
+def feed_parse(proto_formatter, seed, largest):
+    """
+    Parse by feeding the input in chunks of 1 to largest characters
+    """
+    def parse(data):
+        handler = proto_formatter.MessageHandler()
+        parser = proto_formatter.FeedParser(handler)
+        chunks = random.Random(seed)
+        pos = 0
+        while pos < len(data):
+            size = chunks.randint(1, largest)
+            parser.feed(data[pos:pos + size])
+            pos += size
+        parser.close()
+        return handler.message
+    return parse
+
+def inject_errors(data, every=10):
+    """
+    data with a stray '}' or an illegal '$' before every tenth top level
+    line, returns it with the (kind, position) of the errors
+    """
+    out = []
+    errors = []
+    pos = depth = top = 0
+    for line in data.split('\n'):
+        if depth == 0:
+            top += 1
+            if top % every == 0:
+                error = '}' if top // every % 2 else '$'
+                errors.append(('syntax' if error == '}' else 'lexical', pos))
+                line = f'{error} {line}'
+        depth += line.endswith('{') - (line == '}')
+        out.append(line)
+        pos += len(line) + 1
+    return '\n'.join(out), errors
+
+@pytest.fixture(scope='module')
+def engines(proto_formatter):
+    return proto_formatter.FastParser(), proto_formatter.ProtoParser()
+
+@pytest.fixture(scope='module')
+def errors(proto_formatter):
+    return proto_formatter.lex.LexError, proto_formatter.ParseError
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('kind', [str, bytes])
+def test_same_tree(proto_formatter, engines, seed, kind):
+    fast, ply = engines
+    # A raw UTF-8 string too, for chunks that split a character
+    source = debug_string(MESSAGES, seed) + '\nnote: "请求 ok"'
+    if kind is bytes:
+        source = source.encode()
+    message = fast.parse(source)
+    assert same_tree(message, ply.parse(source))
+    assert same_tree(fast.parse_tape(source).to_message(), message)
+    assert same_tree(events_parse(proto_formatter, fast)(source), message)
+    for largest in (1, 7, 4096) if seed == 0 else (7, 4096):
+        assert same_tree(feed_parse(proto_formatter, seed, largest)(source), message), \
+            f'chunks of up to {largest} differ'
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_same_format(proto_formatter, engines, seed):
+    fast, _ = engines
+    source = debug_string(MESSAGES, seed)
+    message = fast.parse(source)
+    tape = fast.parse_tape(source)
+    for o in [proto_formatter.FormatOptions(),
+              proto_formatter.FormatOptions(sort_keys=True, indent=2),
+              proto_formatter.FormatOptions(decode_strings=True, bytes_format='hex')]:
+        text = proto_formatter.DictFormatter(message, o).format()
+        assert proto_formatter.TapeFormatter(tape, o).format() == text
+        if not o.sort_keys:
+            handler = proto_formatter.FormatHandler(o)
+            fast.parse_events(source, handler)
+            assert handler.format() == text
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_injected_errors(engines, capsys, seed):
+    fast, _ = engines
+    data = debug_string(MESSAGES * 4, seed)
+    broken, injected = inject_errors(data)
+    for parser in engines:
+        found = []
+        result = parser.parse(broken, diagnostics=found)
+        assert [(d.kind, d.pos) for d in found] == injected
+        assert same_tree(result, fast.parse(data))
+    assert capsys.readouterr().out == ''
+
+@pytest.mark.parametrize('data, expected', ADJACENT)
+def test_adjacent_errors(engines, capsys, data, expected):
+    for parser in engines:
+        found = []
+        parser.parse(data, diagnostics=found)
+        assert [(d.kind, d.pos) for d in found] == expected
+    assert capsys.readouterr().out == ''
+
+@pytest.mark.parametrize('data', MALFORMED)
+def test_malformed(proto_formatter, engines, errors, capsys, data):
+    fast, ply = engines
+    fast_found, ply_found = [], []
+    assert same_tree(fast.parse(data, diagnostics=fast_found), ply.parse(data, diagnostics=ply_found))
+    assert fast_found == ply_found
+    if ply_found:
+        # Without a list, the first error is raised with all of them
+        for parser in engines:
+            with pytest.raises(proto_formatter.ParseError) as raised:
+                parser.parse(data)
+            assert raised.value.pos == ply_found[0].pos
+            assert raised.value.diagnostics == ply_found
+    assert capsys.readouterr().out == ''
+
+    ply_strict = strict_result(lambda data: ply.parse(data, strict=True), data, errors)
+    for parse in (lambda data: fast.parse(data, strict=True),
+                  lambda data: fast.parse_tape(data).to_message(),
+                  events_parse(proto_formatter, fast), feed_parse(proto_formatter, 0, 1),
+                  feed_parse(proto_formatter, 0, 3)):
+        fast_strict = strict_result(parse, data, errors)
+        assert fast_strict[0] == ply_strict[0]
+        if fast_strict[0] == 'ok':
+            assert same_tree(fast_strict[1], ply_strict[1])
+        else:
+            assert fast_strict[1] == ply_strict[1]
+
+@pytest.mark.parametrize('data', ['a: 1 }', 'a { b: 1', 'a: $'])
+def test_default_error_functions(proto_formatter, errors, capsys, data):
+    # The PLY lexer and the LR parser without an error function of the call
+    # raise as a strict parse, and print nothing
+    ply = proto_formatter.get_parser()
+    lexer = proto_formatter.lex.lex(module=ply)
+    lexer.input(data)
+    with pytest.raises(errors):
+        ply.parser.parse(lexer=lexer)
+    assert capsys.readouterr().out == ''
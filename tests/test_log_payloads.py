@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+"""
+Debug strings in glog/absl log lines, formatted with the rest of the log
+kept as it is
+"""
+
+import time
+
+import pytest
+
+PREFIX = 'I1018 01:23:45.678901 12345 server.cc:42] '
+
+CASES = [
+    ('Request: id: 1 name: "x"', 'Request: {\n    id: 1\n    name: "x"\n}'),
+    ('Got response { status: OK }', 'Got response {\n    status: OK\n}'),
+    ('Response:\nid: 1\nname: "x"', 'Response:\n{\n    id: 1\n    name: "x"\n}'),
+    ('Response:\n  child {\n    v: 2\n  }', 'Response:\n{\n    child {\n        v: 2\n    }\n}'),
+    ('Server started, port: 8080', 'Server started, port: 8080'),
+    ('retries: 3', 'retries: 3'),
+    ('failed: deadline exceeded', 'failed: deadline exceeded'),
+    ('a: 1 b: 2 done.', 'a: 1 b: 2 done.'),
+]
+
+@pytest.mark.parametrize('message, expected', CASES)
+def test_payload(proto_formatter, message, expected):
+    options = proto_formatter.FormatOptions(log_payloads=True)
+    log = f'Log file created at: 2026/10/18\n{PREFIX}{message}\n{PREFIX}next\n'
+    formatted = f'Log file created at: 2026/10/18\n{PREFIX}{expected}\n{PREFIX}next\n'
+    for data in (log, log.encode(), memoryview(log.encode())):
+        assert proto_formatter.ProtoFormatter(data, options).format() == formatted
+
+def test_long_line_is_linear(proto_formatter):
+    # Every word of a line that is no debug string is a possible start
+    options = proto_formatter.FormatOptions(log_payloads=True)
+    log = PREFIX + 'x: 1 ' * 20000 + 'done.\n'
+    start = time.perf_counter()
+    assert proto_formatter.ProtoFormatter(log, options).format() == log
+    assert time.perf_counter() - start < 5
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+"""
+The full PLY rule validation that the plugin skips at runtime, and the
+shipped tables against the grammar
+"""
+
+import gen_tables
+
+def test_rules_validate(proto_formatter):
+    log = gen_tables.ValidationLogger()
+    proto_formatter.ProtoParser(tables=None, cachedir=None, optimize=False, errorlog=log)
+    assert log.messages == []
+
+def test_tables_up_to_date():
+    assert gen_tables.check(), 'proto_tables.py is out of date, run tools/gen_tables.py'
+
+def test_value_rule_arity(proto_formatter):
+    yacc = proto_formatter.yacc
+
+    class BadParser(proto_formatter.ProtoParser):
+        @yacc.value_rule
+        def p_expression_pair(self, key, value):
+            """pair : key ':' literal
+                    | key object"""
+            return key, value
+
+    log = gen_tables.ValidationLogger()
+    try:
+        BadParser(tables=None, cachedir=None, optimize=False, errorlog=log)
+    except yacc.YaccError:
+        pass
+    assert any("'p_expression_pair' cannot take the 3 values" in m for m in log.messages), log.messages
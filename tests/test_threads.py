@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+Debug strings formatted from many threads at once give the results of a
+single threaded run: well-formed debug strings as str and bytes with both
+engines, and strict parses of malformed ones, which must fail at the same
+position.
+"""
+
+import sys
+import threading
+
+from bench_tokenizer import debug_string
+from test_engines import MALFORMED
+
+THREADS = 8
+ROUNDS = 2
+MESSAGES = 20
+
+def jobs(proto_formatter):
+    """
+    The (function, argument) calls run by every thread
+    """
+    formatter = proto_formatter.ProtoFormatter
+    options = proto_formatter.FormatOptions
+    errors = (proto_formatter.lex.LexError, proto_formatter.ParseError)
+
+    def format_with(engine):
+        return lambda data: formatter(data, options(engine=engine)).format()
+
+    def strict_with(engine):
+        def strict(data):
+            try:
+                return proto_formatter.get_engine(engine).parse(data, strict=True)
+            except errors as err:
+                return type(err).__name__, getattr(err, 'pos', None)
+        return strict
+
+    calls = []
+    for seed in range(4):
+        data = debug_string(MESSAGES, seed)
+        for engine in ('fast', 'ply'):
+            calls.append((format_with(engine), data))
+            calls.append((format_with(engine), data.encode()))
+    for data in MALFORMED:
+        for engine in ('fast', 'ply'):
+            calls.append((strict_with(engine), data))
+    return calls
+
+def test_concurrent_formats(proto_formatter):
+    calls = jobs(proto_formatter)
+    expected = [func(data) for func, data in calls]
+    failures = []
+    start = threading.Barrier(THREADS)
+
+    def worker(index):
+        start.wait()
+        for round in range(ROUNDS):
+            # Every thread runs the calls in a different order
+            order = range(len(calls))
+            if (index + round) % 2:
+                order = reversed(order)
+            for i in order:
+                func, data = calls[i]
+                try:
+                    result = func(data)
+                except Exception as err:
+                    result = err
+                if result != expected[i]:
+                    failures.append(f'thread {index}, call {i}: {result!r:.200}')
+
+    # Switch threads as often as possible to interleave the parses
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert not failures, '\n'.join(failures[:20])
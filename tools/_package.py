@@ -0,0 +1,20 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import importlib
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load(name='pretty_protobuf'):
+    """
+    Import the plugin package from the repository root, the package directory
+    name ("Pretty Protobuf" once installed) is not a valid module name
+    """
+    if name not in sys.modules:
+        package = types.ModuleType(name)
+        package.__path__ = [ROOT]
+        sys.modules[name] = package
+    return importlib.import_module(name + '.proto_formatter')
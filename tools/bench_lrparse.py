@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the LR parsing loop of the PLY engine alone: the tokens of a
+synthetic debug string are scanned once and replayed from a list, and
+nothing is formatted. The fast loop over the flat integer tables is
+compared with the general loop, which runs when tracking positions.
+Results are printed as JSON.
+
+    python tools/bench_lrparse.py [--messages N] [--repeat N] [--output FILE]
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import _package
+from bench_tokenizer import debug_string
+
+class Replay:
+    """
+    Lexer interface that returns the tokens of a list
+    """
+    def __init__(self, tokens):
+        self.token = iter(tokens).__next__
+        self.lineno = 1
+        self.lexpos = 0
+
+def measure(func, ntokens, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        'min_ms': round(min(times) * 1000, 4),
+        'median_ms': round(statistics.median(times) * 1000, 4),
+        'tokens_per_sec': round(ntokens / min(times)),
+    }
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argparser.add_argument('--messages', type=int, default=5000,
+                           help='top level messages in the debug string')
+    argparser.add_argument('--repeat', type=int, default=5, help='samples per measurement')
+    argparser.add_argument('--output', help='write the JSON results to this file')
+    args = argparser.parse_args()
+
+    proto_formatter = _package.load()
+    parser = proto_formatter.ProtoParser().parser
+    data = debug_string(args.messages)
+    # The trailing None ends the input
+    tokens = list(proto_formatter.ProtoScanner().tokens(data)) + [None]
+    ntokens = len(tokens) - 1
+
+    fast = parser.parse(lexer=Replay(tokens))
+    general = parser.parse(lexer=Replay(tokens), tracking=True)
+    if fast != general:
+        sys.exit('the fast and the general loop disagree')
+
+    results = {
+        'benchmark': 'lrparse',
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'bytes': len(data),
+        'tokens': ntokens,
+        'states': parser.nstates,
+        'fast': measure(lambda: parser.parse(lexer=Replay(tokens)), ntokens, args.repeat),
+        'general': measure(lambda: parser.parse(lexer=Replay(tokens), tracking=True),
+                           ntokens, args.repeat),
+    }
+    results['speedup'] = round(results['general']['min_ms'] / results['fast']['min_ms'], 2)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure LALR table construction (yacc.LRTable) on synthetic grammars of
+increasing size, so that a table cache miss stays cheap as the debug string
+grammar grows. Results are printed as JSON.
+
+    python tools/bench_lrtable.py [--sizes 1,2,4,...] [--repeat N] [--output FILE]
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import _package
+
+def synthetic_grammar(yacc, n):
+    """
+    Build a grammar with n statement kinds, each with its own expression
+    chain, nullable modifier lists and nested blocks
+    """
+    terminals = ['ID', 'NUM', 'SEMI', 'COMMA', 'LBRACE', 'RBRACE', 'LPAREN', 'RPAREN']
+    for i in range(n):
+        terminals += [f'KW{i}', f'OP{i}', f'MOD{i}']
+    grammar = yacc.Grammar(terminals)
+
+    rules = ['program : stmts',
+             'stmts : stmts stmt',
+             'stmts :',
+             'args : args COMMA expr0',
+             'args : expr0',
+             'args :']
+    for i in range(n):
+        rules += [f'stmt : KW{i} expr{i} SEMI',
+                  f'stmt : KW{i} LBRACE stmts RBRACE',
+                  f'stmt : KW{i} LPAREN args RPAREN SEMI',
+                  f'expr{i} : expr{i} OP{i} term{i}',
+                  f'expr{i} : term{i}',
+                  f'term{i} : mods{i} ID',
+                  f'term{i} : NUM',
+                  f'term{i} : LPAREN expr{(i + 1) % n} RPAREN',
+                  f'mods{i} : mods{i} MOD{i}',
+                  f'mods{i} :']
+    for line, rule in enumerate(rules, 1):
+        name, syms = rule.split(':')
+        grammar.add_production(name.strip(), syms.split(), None, 'synthetic', line)
+    grammar.set_start('program')
+    return grammar
+
+def proto_grammar(proto_formatter):
+    """
+    Build the grammar of ProtoParser
+    """
+    yacc = proto_formatter.yacc
+    parser = proto_formatter.ProtoParser.__new__(proto_formatter.ProtoParser)
+    pinfo = yacc.ParserReflect(yacc.get_module_dict(parser))
+    pinfo.get_all()
+    pinfo.get_grammar()
+    grammar = yacc.Grammar(pinfo.tokens)
+    for funcname, (file, line, prodname, syms) in pinfo.grammar:
+        grammar.add_production(prodname, syms, funcname, file, line)
+    grammar.set_start(pinfo.start)
+    return grammar
+
+def measure(make_grammar, yacc, repeat):
+    times = []
+    for _ in range(repeat):
+        grammar = make_grammar()
+        start = time.perf_counter()
+        lr = yacc.LRTable(grammar)
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        'productions': len(grammar.Productions),
+        'states': len(lr.lr_action),
+        'min_ms': round(min(times), 4),
+        'median_ms': round(statistics.median(times), 4),
+    }
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argparser.add_argument('--sizes', default='1,2,4,8,16,32,64',
+                           help='comma separated numbers of statement kinds')
+    argparser.add_argument('--repeat', type=int, default=5, help='samples per grammar')
+    argparser.add_argument('--output', help='write the JSON results to this file')
+    args = argparser.parse_args()
+
+    proto_formatter = _package.load()
+    yacc = proto_formatter.yacc
+
+    grammars = {'proto': measure(lambda: proto_grammar(proto_formatter), yacc, args.repeat)}
+    for n in map(int, args.sizes.split(',')):
+        grammars[f'synthetic_{n}'] = measure(lambda: synthetic_grammar(yacc, n), yacc, args.repeat)
+
+    results = {
+        'benchmark': 'lrtable',
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'grammars': grammars,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
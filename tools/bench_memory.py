@@ -0,0 +1,108 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the memory allocated per token with tracemalloc: the tokens of a
+synthetic debug string kept alive at once, the peak and garbage collections
+of parsing it, the size of the parsed Message and Tape, and the peak of
+parsing it to events that are dropped. Also the peak of formatting it from
+a file, read into a str or mapped in memory, with each engine. Results are
+printed as JSON.
+
+    python tools/bench_memory.py [--messages N] [--output FILE]
+"""
+
+import argparse
+import gc
+import json
+import mmap
+import os
+import platform
+import sys
+import tempfile
+import tracemalloc
+
+import _package
+from bench_tokenizer import debug_string
+
+def collections():
+    return sum(s['collections'] for s in gc.get_stats())
+
+def traced(func):
+    """
+    Call func, returns the memory it still holds on return, its peak memory
+    and the garbage collections it triggered
+    """
+    gc.collect()
+    before = collections()
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    after = collections()
+    del result
+    return current, peak, after - before
+
+def format_file(proto_formatter, path, mapped, engine):
+    options = proto_formatter.FormatOptions(engine=engine)
+    with open(path, 'rb') as f:
+        if not mapped:
+            return proto_formatter.ProtoFormatter(f.read().decode(), options).format()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return proto_formatter.ProtoFormatter(data, options).format()
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argparser.add_argument('--messages', type=int, default=2000,
+                           help='top level messages in the debug string')
+    argparser.add_argument('--output', help='write the JSON results to this file')
+    args = argparser.parse_args()
+
+    proto_formatter = _package.load()
+    parser = proto_formatter.ProtoParser(tables=None, cachedir=None)
+    data = debug_string(args.messages)
+    ntokens = sum(1 for _ in proto_formatter.ProtoScanner().scan(data))
+
+    tokens, _, _ = traced(lambda: list(proto_formatter.ProtoScanner().tokens(data)))
+    _, peak, gcs = traced(lambda: parser.parse(data))
+    result, _, _ = traced(lambda: parser.parse(data))
+    tape, _, _ = traced(lambda: proto_formatter.FastParser().parse_tape(data))
+    _, events_peak, _ = traced(lambda: proto_formatter.FastParser().parse_events(
+        data, proto_formatter.ProtoHandler()))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'debug_string.txt')
+        with open(path, 'w') as f:
+            f.write(data)
+        proto_formatter.get_parser()
+        peaks = {}
+        for engine in ('fast', 'ply'):
+            for mapped in (False, True):
+                _, format_peak, _ = traced(lambda: format_file(proto_formatter, path, mapped, engine))
+                key = f'format_{engine}_{"mmap" if mapped else "read"}_peak_bytes_per_byte'
+                peaks[key] = round(format_peak / len(data), 2)
+
+    results = {
+        'benchmark': 'memory',
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'bytes': len(data),
+        'tokens': ntokens,
+        'token_bytes_per_token': round(tokens / ntokens, 2),
+        'parse_peak_bytes_per_token': round(peak / ntokens, 2),
+        'parse_result_bytes_per_token': round(result / ntokens, 2),
+        'tape_bytes_per_token': round(tape / ntokens, 2),
+        'events_peak_bytes': events_peak,
+        'parse_gc_collections': gcs,
+        **peaks,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
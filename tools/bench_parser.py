@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the parse throughput of the engines, FastParser ('fast') against
+ProtoParser ('ply'), on synthetic debug strings of increasing size, and the
+cost of constructing each parser. Results are printed as JSON.
+
+    python tools/bench_parser.py [--sizes 100,1000,...] [--repeat N] [--output FILE]
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import _package
+from bench_tokenizer import debug_string
+
+def measure(func, ntokens, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        'min_ms': round(min(times) * 1000, 4),
+        'median_ms': round(statistics.median(times) * 1000, 4),
+        'tokens_per_sec': round(ntokens / min(times)),
+    }
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argparser.add_argument('--sizes', default='100,1000,10000',
+                           help='comma separated numbers of top level messages')
+    argparser.add_argument('--repeat', type=int, default=5, help='samples per measurement')
+    argparser.add_argument('--output', help='write the JSON results to this file')
+    args = argparser.parse_args()
+
+    proto_formatter = _package.load()
+    engines = {
+        'fast': proto_formatter.FastParser,
+        'ply': proto_formatter.ProtoParser,
+    }
+    construct = {name: measure(cls, 1, args.repeat) for name, cls in engines.items()}
+    for result in construct.values():
+        del result['tokens_per_sec']
+    parsers = {name: cls() for name, cls in engines.items()}
+
+    sizes = {}
+    for n in map(int, args.sizes.split(',')):
+        data = debug_string(n)
+        ntokens = sum(1 for _ in proto_formatter.ProtoScanner().scan(data))
+        size = {'bytes': len(data), 'tokens': ntokens}
+        for name, parser in parsers.items():
+            size[name] = measure(lambda: parser.parse(data), ntokens, args.repeat)
+        size['speedup'] = round(size['ply']['min_ms'] / size['fast']['min_ms'], 2)
+        sizes[f'messages_{n}'] = size
+
+    results = {
+        'benchmark': 'parser',
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'construct': construct,
+        'sizes': sizes,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure the startup cost of the debug string formatter: importing
+proto_formatter, constructing ProtoParser (lexer build, grammar build and
+LALR table build, and restoring from the shipped tables or the disk cache)
+and the first ProtoFormatter.format() call.
+
+Cold numbers are taken in a fresh interpreter per sample, warm numbers are
+repeated in one interpreter. Results are printed as JSON.
+
+    python tools/bench_startup.py [--repeat N] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import _package
+
+SAMPLE = ('id: 42 name: "pretty" ratio: 0.5 kind: ENUM_VALUE '
+          'child { id: 1 tag: "a" tag: "b" flag: true } child { } 7: -1')
+
+def _ms(start):
+    return (time.perf_counter() - start) * 1000
+
+def measure_import():
+    for name in [m for m in sys.modules if m.startswith('pretty_protobuf')]:
+        del sys.modules[name]
+    start = time.perf_counter()
+    proto_formatter = _package.load()
+    return _ms(start), proto_formatter
+
+def measure_build(proto_formatter):
+    """
+    Build ProtoParser from its rules step by step, the way yacc() does
+    """
+    lex, yacc = proto_formatter.lex, proto_formatter.yacc
+    parser = proto_formatter.ProtoParser.__new__(proto_formatter.ProtoParser)
+    timings = {}
+
+    start = time.perf_counter()
+    lex.lex(module=parser, optimize=True)
+    timings['lex_build'] = _ms(start)
+
+    start = time.perf_counter()
+    pinfo = yacc.ParserReflect(yacc.get_module_dict(parser))
+    pinfo.get_all()
+    pinfo.get_grammar()
+    grammar = yacc.Grammar(pinfo.tokens)
+    for term, assoc, level in pinfo.preclist:
+        grammar.set_precedence(term, assoc, level)
+    for funcname, (file, line, prodname, syms) in pinfo.grammar:
+        grammar.add_production(prodname, syms, funcname, file, line)
+    grammar.set_start(pinfo.start)
+    timings['grammar_build'] = _ms(start)
+
+    start = time.perf_counter()
+    yacc.LRTable(grammar)
+    timings['lalr_build'] = _ms(start)
+
+    start = time.perf_counter()
+    proto_formatter.ProtoParser(tables=None, cachedir=None)
+    timings['parser_build'] = _ms(start)
+    return timings
+
+def measure_restore(proto_formatter, cachedir):
+    timings = {}
+    start = time.perf_counter()
+    proto_formatter.ProtoParser()
+    timings['parser_tables'] = _ms(start)
+
+    # The first construction fills the cache, the second one reads it
+    proto_formatter.ProtoParser(tables=None, cachedir=cachedir)
+    start = time.perf_counter()
+    proto_formatter.ProtoParser(tables=None, cachedir=cachedir)
+    timings['parser_cache'] = _ms(start)
+    return timings
+
+def measure_first_format(proto_formatter):
+    proto_formatter._parser = None
+    proto_formatter._thread_parsers = proto_formatter.threading.local()
+    start = time.perf_counter()
+    proto_formatter.ProtoFormatter(SAMPLE).format()
+    return _ms(start)
+
+def sample(cachedir):
+    """
+    Take one sample of every measurement in the current interpreter
+    """
+    timings = {}
+    timings['import'], proto_formatter = measure_import()
+    timings['first_format'] = measure_first_format(proto_formatter)
+    timings.update(measure_build(proto_formatter))
+    timings.update(measure_restore(proto_formatter, cachedir))
+    return timings
+
+def summarize(samples):
+    result = {}
+    for key in samples[0]:
+        values = [s[key] for s in samples]
+        result[key] = {
+            'min_ms': round(min(values), 4),
+            'median_ms': round(statistics.median(values), 4),
+            'mean_ms': round(statistics.mean(values), 4),
+        }
+    return result
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argparser.add_argument('--repeat', type=int, default=10, help='samples per measurement')
+    argparser.add_argument('--output', help='write the JSON results to this file')
+    argparser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cachedir:
+        if args.child:
+            print(json.dumps(sample(cachedir)))
+            return 0
+
+        cold = []
+        for _ in range(args.repeat):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'],
+                                 check=True, stdout=subprocess.PIPE, universal_newlines=True)
+            cold.append(json.loads(out.stdout))
+
+        # Discard the first in-process sample, it is the cold one
+        sample(cachedir)
+        warm = [sample(cachedir) for _ in range(args.repeat)]
+
+    results = {
+        'benchmark': 'startup',
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'cold': summarize(cold),
+        'warm': summarize(warm),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
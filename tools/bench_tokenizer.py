@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measure tokenizer throughput in tokens per second on a synthetic debug string:
+the PLY lexer built from the ProtoParser rules against ProtoScanner, both
+alone and feeding the parser. Results are printed as JSON.
+
+    python tools/bench_tokenizer.py [--messages N] [--repeat N] [--output FILE]
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import _package
+
+VALUES = ['42', '-7', '0.5', '2.25e10', '3e5f', 'true', 'ENUM_VALUE', '"hello"',
+          '"a\\"b"', '"\\350\\257\\267ok"', '"\\x41\\x42"']
+
+def debug_string(messages, seed=1):
+    """
+    Build a debug string of nested messages with scalar and repeated fields
+    """
+    rand = random.Random(seed)
+
+    def message(depth):
+        fields = []
+        for _ in range(rand.randint(1, 8)):
+            name = rand.choice(['id', 'name', 'value', 'items', 'child', 'flag', '7'])
+            if depth < 4 and rand.random() < 0.2:
+                fields.append(f'{name} {{\n{message(depth + 1)}\n}}')
+            else:
+                fields.append(f'{name}: {rand.choice(VALUES)}')
+        return '\n'.join(fields)
+
+    return '\n'.join(message(0) for _ in range(messages))
+
+def count_lex(lexer, data):
+    lexer.input(data)
+    count = 0
+    while lexer.token():
+        count += 1
+    return count
+
+def count_scan(scanner, data):
+    count = 0
+    for _ in scanner.scan(data):
+        count += 1
+    return count
+
+def measure(func, ntokens, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        'min_ms': round(min(times) * 1000, 4),
+        'median_ms': round(statistics.median(times) * 1000, 4),
+        'tokens_per_sec': round(ntokens / min(times)),
+    }
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argparser.add_argument('--messages', type=int, default=5000,
+                           help='top level messages in the debug string')
+    argparser.add_argument('--repeat', type=int, default=5, help='samples per measurement')
+    argparser.add_argument('--output', help='write the JSON results to this file')
+    args = argparser.parse_args()
+
+    proto_formatter = _package.load()
+    parser = proto_formatter.ProtoParser(tables=None, cachedir=None)
+    scanner = proto_formatter.ProtoScanner()
+    data = debug_string(args.messages)
+    ntokens = count_scan(scanner, data)
+    if count_lex(parser.lexer.clone(), data) != ntokens:
+        sys.exit('lex and ProtoScanner disagree on the number of tokens')
+
+    results = {
+        'benchmark': 'tokenizer',
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'bytes': len(data),
+        'tokens': ntokens,
+        'lex': measure(lambda: count_lex(parser.lexer.clone(), data), ntokens, args.repeat),
+        'scan': measure(lambda: count_scan(proto_formatter.ProtoScanner(), data),
+                        ntokens, args.repeat),
+        'token': measure(lambda: count_lex(proto_formatter.ProtoScanner(), data),
+                         ntokens, args.repeat),
+        'parse_lex': measure(lambda: parser.parser.parse(data, lexer=parser.lexer.clone()),
+                             ntokens, args.repeat),
+        'parse_scanner': measure(lambda: parser.parse(data), ntokens, args.repeat),
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
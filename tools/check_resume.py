@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Check that IncrementalFormatter, after random edits of the formatted text,
+formats to the same text with the same diagnostics as format_result() of
+ProtoFormatter formatting it whole, leaves a text with errors as it is, and
+parses less than the whole text: edits of a value, inserted and deleted
+fields, unbalanced braces, syntax errors and open strings, one after the
+other as in a view, where an edit that breaks the syntax is undone after
+formatting.
+Prints the mean latency of a resumed format against a whole one, for the
+edits that keep the syntax and follow a resumable format.
+
+    python tools/check_resume.py [--seeds N] [--edits N] [--messages N]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+import _package
+from bench_tokenizer import debug_string
+
+def edit(text, rand):
+    """
+    text with a random edit, usually inside a line
+    """
+    pos = rand.randrange(len(text))
+    kind = rand.random()
+    if kind < 0.4:
+        return text[:pos] + rand.choice(['1', 'x', ' ', '"a b"', '\n']) + text[pos:]
+    if kind < 0.6:
+        return text[:pos] + text[pos + rand.randint(1, 20):]
+    if kind < 0.8:
+        return text[:pos] + rand.choice(['\nnew: 5\n', '\nm { k: "v" }\n']) + text[pos:]
+    if kind < 0.9:
+        return text[:pos] + rand.choice(['{', '}', ':', '$']) + text[pos:]
+    if kind < 0.95:
+        # A string left open by a backslash at the end of the line
+        end = text.find('\n', pos) % (len(text) + 1)
+        return text[:end] + ' "a\\' + text[end:]
+    line = text.rfind('\n', 0, pos) + 1
+    return text[:line] + text[text.find('\n', pos) + 1 or len(text):]
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argparser.add_argument('--seeds', type=int, default=5, help='synthetic debug strings')
+    argparser.add_argument('--edits', type=int, default=100, help='edits per debug string')
+    argparser.add_argument('--messages', type=int, default=200,
+                           help='top level messages per debug string')
+    args = argparser.parse_args()
+
+    proto_formatter = _package.load()
+    errors = (proto_formatter.lex.LexError, proto_formatter.ParseError)
+    failures = []
+    resumed = whole = 0.0
+    count = 0
+    edits = 0
+    for seed in range(args.seeds):
+        rand = random.Random(seed)
+        options = proto_formatter.FormatOptions(indent=rand.choice([2, 4]),
+                                                bytes_format=rand.choice(['escape', 'hex']))
+        formatter = proto_formatter.IncrementalFormatter(options)
+        start, end, text = formatter.format(debug_string(args.messages, seed))
+        for n in range(args.edits):
+            edited = edit(text, rand)
+            try:
+                proto_formatter.get_engine('fast').parse(edited, strict=True)
+                valid = True
+            except errors:
+                valid = False
+            cached = formatter.text is not None
+            t = time.perf_counter()
+            result = formatter.format(edited)
+            t1 = time.perf_counter()
+            # The text that could be parsed and the errors, which the
+            # incremental format must diagnose the same
+            expected, diagnostics = proto_formatter.ProtoFormatter(edited, options).format_result()
+            t2 = time.perf_counter()
+            edits += 1
+            if formatter.diagnostics != diagnostics:
+                failures.append(f'seed {seed}, edit {n}: diagnostics differ, '
+                                f'{formatter.diagnostics} against {diagnostics}')
+            if valid and cached:
+                resumed += t1 - t
+                whole += t2 - t1
+                count += 1
+            if result is None:
+                if not diagnostics:
+                    failures.append(f'seed {seed}, edit {n}: nothing formatted')
+                continue
+            if diagnostics:
+                failures.append(f'seed {seed}, edit {n}: formatted despite errors')
+                continue
+            start, end, output = result
+            formatted = edited[:start] + output + edited[end:]
+            if formatted != expected:
+                failures.append(f'seed {seed}, edit {n}: output differs at '
+                                f'{next(i for i, (a, b) in enumerate(zip(formatted, expected)) if a != b)}')
+                formatter = proto_formatter.IncrementalFormatter(options)
+            elif valid:
+                text = formatted
+
+    if failures:
+        sys.exit('\n'.join(failures[:50]))
+    print(f'{edits} edits of {args.seeds} debug strings format the same, '
+          f'{resumed / count * 1000:.2f} ms resumed against {whole / count * 1000:.2f} ms whole')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
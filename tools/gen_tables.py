@@ -0,0 +1,93 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Generate proto_tables.py, the lexer and parser tables of ProtoParser frozen
+as Python literals, so that the plugin never has to build them at runtime.
+
+    python tools/gen_tables.py          # regenerate proto_tables.py
+    python tools/gen_tables.py --check  # fail if proto_tables.py is out of date
+
+Both run the full PLY rule validation that the plugin skips at runtime, and
+fail on any error or warning it reports.
+"""
+
+import argparse
+import io
+import os
+import sys
+
+import _package
+
+class ValidationLogger:
+    """
+    Collects the errors and warnings reported while validating the rules
+    """
+    def __init__(self):
+        self.messages = []
+
+    def error(self, msg, *args, **kwargs):
+        self.messages.append('ERROR: ' + (msg % args))
+
+    def warning(self, msg, *args, **kwargs):
+        self.messages.append('WARNING: ' + (msg % args))
+
+    def info(self, msg, *args, **kwargs):
+        pass
+
+    critical = error
+    debug = info
+
+def build():
+    """
+    Build ProtoParser from its rules with full validation, exits if the rules
+    have any problem
+    """
+    proto_formatter = _package.load()
+    log = ValidationLogger()
+    try:
+        parser = proto_formatter.ProtoParser(tables=None, cachedir=None,
+                                             optimize=False, errorlog=log)
+    except (SyntaxError, proto_formatter.yacc.YaccError) as err:
+        log.messages.append(f'ERROR: {err}')
+    if log.messages:
+        sys.exit('\n'.join(log.messages))
+    return parser
+
+def generate():
+    f = io.StringIO()
+    build().write_tables(f)
+    return f.getvalue()
+
+def check():
+    """
+    Return True if the shipped tables still match the lexer rules and grammar
+    docstrings of ProtoParser
+    """
+    parser = build()
+    tables = _package.load().proto_tables
+    return tables is not None and parser.load_tables(tables)
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argparser.add_argument('--check', action='store_true',
+                           help='exit with an error if the generated module is out of date')
+    args = argparser.parse_args()
+
+    filename = os.path.join(_package.ROOT, 'proto_tables.py')
+    if args.check:
+        if not check():
+            print(f'{filename} does not match the grammar in proto_formatter.py, '
+                  f'run tools/gen_tables.py to regenerate it')
+            return 1
+        print(f'{filename} is up to date')
+        return 0
+
+    source = generate()
+    with open(filename, 'w') as f:
+        f.write(source)
+    print(f'Wrote {filename}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())